@@ -0,0 +1,8 @@
+"""
+OSRS clan rank sync: process Clanmate Export uploads, match RSNs to
+Discord members and track RSN changes.
+
+Stages live in submodules (clan_sync.ranks, clan_sync.matching,
+clan_sync.renames, clan_sync.updates); run the whole sync with
+`python -m clan_sync` (see clan_sync.pipeline).
+"""
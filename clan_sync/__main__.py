@@ -0,0 +1,3 @@
+from clan_sync.pipeline import main
+
+main()
@@ -0,0 +1,335 @@
+"""
+Benchmark the sync stages on synthetic clans of configurable size.
+
+For each size a scratch directory gets two clanrank_*.json uploads a day
+apart (joins, leaves, rank changes, renames and busy same-day join dates)
+and a discord_members.csv export (nickname noise, clan tags, typos, digit
+suffixes on usernames, excluded roles and unrelated accounts). The harness
+then times process_clan_ranks, compare_clan_files, match_members (full and
+from a warm cache), each matching priority tier in isolation and
+update_matched_members, and writes the timings as JSON so runs can be
+compared between versions.
+
+Usage: python -m clan_sync.bench [--sizes 1000 10000 100000] [--output FILE] [--compare OLD_FILE]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from clan_sync.discord_members import DiscordMembers
+from clan_sync.matching import EXCLUDED_ROLES, SCORERS, RosterMatcher, match_members
+from clan_sync.ranks import process_clan_ranks
+from clan_sync.renames import compare_clan_files
+from clan_sync.trigram import TrigramIndex
+from clan_sync.updates import update_matched_members
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_OUTPUT = "benchmark_results.json"
+# Names looked up per tier when timing the tiers in isolation
+TIER_SAMPLE = 2000
+BENCH_VERSION = 1
+
+# Rough rank mix of the real clan
+RANK_WEIGHTS = {
+    "Bronze": 77, "Rune": 74, "Beast": 67, "Mithril": 42, "Iron": 41, "Adamant": 30, "Steel": 28,
+    "Dragonstone": 21, "Ruby": 18, "Diamond": 15, "Onyx": 14, "Emerald": 13, "Sapphire": 12,
+    "Master": 12, "Deputy Owner": 12, "Administrator": 5, "Coordinator": 2
+}
+SYLLABLES = [
+    "zez", "ima", "iron", "bob", "dark", "lord", "pk", "slay", "er", "mage", "ran", "ger", "sky", "fire",
+    "ice", "tor", "ak", "vin", "el", "mo", "ra", "ka", "shi", "no", "dra", "gon", "wolf", "fox", "ly", "th"
+]
+
+# === Synthetic data ===
+def format_joined_date(day):
+    return f"{day.day}-{day.strftime('%b')}-{day.year}"
+
+def make_rsn(rng, taken):
+    """A unique RSN-like name: 1-12 characters of words, digits, spaces, - and _."""
+    while True:
+        words = [rng.choice(SYLLABLES) + rng.choice(SYLLABLES) for _ in range(rng.choice((1, 1, 2)))]
+        words = [w.capitalize() if rng.random() < 0.6 else w for w in words]
+        name = rng.choice((" ", "_", "-", "")).join(words)
+        if rng.random() < 0.3:
+            name += str(rng.randint(1, 999))
+        name = name[:12].strip(" _-")
+        if name and name.lower() not in taken:
+            taken.add(name.lower())
+            return name
+
+def make_roster(rng, size, taken, today):
+    """{rsn: (rank, joinedDate)}; about a third join on a few busy recruitment days."""
+    ranks, weights = list(RANK_WEIGHTS), list(RANK_WEIGHTS.values())
+    busy_days = [today - timedelta(days=rng.randint(1, 1500)) for _ in range(max(1, size // 200))]
+    roster = {}
+    for _ in range(size):
+        if rng.random() < 0.35:
+            day = rng.choice(busy_days)
+        else:
+            day = today - timedelta(days=rng.randint(1, 1800))
+        roster[make_rsn(rng, taken)] = (rng.choices(ranks, weights)[0], format_joined_date(day))
+    return roster
+
+def next_roster(rng, roster, taken, today):
+    """The roster a day later: 2% leave, 2% join, 3% change rank and 1% rename."""
+    ranks, weights = list(RANK_WEIGHTS), list(RANK_WEIGHTS.values())
+    members = list(roster.items())
+    rng.shuffle(members)
+    count = len(members)
+    leaving = count * 2 // 100
+    renaming = count // 100
+    promoting = count * 3 // 100
+
+    new_roster = {}
+    renames = {}
+    for i, (rsn, (rank, joined_date)) in enumerate(members):
+        if i < leaving:
+            continue
+        if i < leaving + renaming:
+            new_rsn = make_rsn(rng, taken)
+            renames[rsn] = new_rsn
+            rsn = new_rsn
+        elif i < leaving + renaming + promoting:
+            rank = rng.choices(ranks, weights)[0]
+        new_roster[rsn] = (rank, joined_date)
+    for _ in range(count * 2 // 100):
+        new_roster[make_rsn(rng, taken)] = (rng.choices(ranks, weights)[0], format_joined_date(today))
+    return new_roster, renames
+
+def write_upload(path, roster, rng):
+    entries = [{"rsn": rsn, "rank": rank, "joinedDate": jd} for rsn, (rank, jd) in roster.items()]
+    rng.shuffle(entries)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"clanName": "Bench Clan", "clanMemberMaps": entries}, f, indent=2)
+
+def _typo(rng, name):
+    if len(name) < 5:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+
+def discord_row(rng, discord_id, rsn, taken):
+    """One Discord member for an RSN, its name disguised the way real members do it."""
+    compact = rsn.replace(" ", "").lower()
+    user = compact[:10] + str(rng.randint(10, 9999)) if rng.random() < 0.5 else make_rsn(rng, taken).lower()
+    global_name = rsn if rng.random() < 0.5 else ""
+    style = rng.random()
+    if style < 0.35:
+        nick = rsn
+    elif style < 0.5:
+        nick = compact
+    elif style < 0.6:
+        nick = f"[{rng.choice(('BC', 'CLAN', 'PvM'))}] {rsn}"
+    elif style < 0.7:
+        nick = f"{rsn} | {rng.choice(SYLLABLES).capitalize()}"
+    elif style < 0.8:
+        nick = _typo(rng, rsn)
+    elif style < 0.85:
+        nick = rsn[:max(3, len(rsn) - 3)]
+    else:
+        nick = ""
+    roles = ["Clan Member"]
+    if rng.random() < 0.2:
+        roles.append(rng.choice(("Bingo Player", "Mentor", "Video Alerts", "Event Coordinator")))
+    if rng.random() < 0.03:
+        roles.append(rng.choice(sorted(EXCLUDED_ROLES)))
+    return [user, global_name, str(discord_id), nick, ", ".join(roles)]
+
+def write_discord_csv(path, rng, roster, taken):
+    """Rows for about 70% of the roster plus 10% unrelated accounts, shuffled."""
+    rows = []
+    discord_id = 10 ** 17
+    for rsn in roster:
+        if rng.random() < 0.7:
+            discord_id += rng.randint(1, 10 ** 6)
+            rows.append(discord_row(rng, discord_id, rsn, taken))
+    for _ in range(len(roster) // 10):
+        discord_id += rng.randint(1, 10 ** 6)
+        stranger = make_rsn(rng, taken)
+        rows.append([stranger.lower(), stranger, str(discord_id), "", "Clan Guest" if rng.random() < 0.3 else ""])
+    rng.shuffle(rows)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["User", "Global Display Name", "ID", "Nickname", "Roles"])
+        writer.writerows(rows)
+    return len(rows)
+
+def generate(workdir, size, seed=0):
+    """Write uploads/ and data/discord_members.csv for a synthetic clan into workdir."""
+    rng = random.Random(seed * 1000003 + size)
+    taken = set()
+    today = date(2025, 6, 1)
+    old_roster = make_roster(rng, size, taken, today)
+    new_roster, renames = next_roster(rng, old_roster, taken, today + timedelta(days=1))
+
+    os.makedirs(os.path.join(workdir, "uploads"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    old_file = os.path.join(workdir, "uploads", "clanrank_20250601_120000.json")
+    new_file = os.path.join(workdir, "uploads", "clanrank_20250602_120000.json")
+    write_upload(old_file, old_roster, rng)
+    write_upload(new_file, new_roster, rng)
+    discord_rows = write_discord_csv(os.path.join(workdir, "data", "discord_members.csv"), rng, new_roster, taken)
+    return {
+        "members": len(new_roster),
+        "discord_rows": discord_rows,
+        "true_renames": len(renames),
+        "old_upload": old_file,
+        "new_upload": new_file
+    }
+
+# === Timing ===
+def timed(fn, *args, **kwargs):
+    """(result, seconds) of fn(*args), with its progress output discarded."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def time_tiers(roster, members, sample=TIER_SAMPLE, seed=0):
+    """
+    Time each matching priority tier on its own over the same sample of
+    normalized names (not only the names that would reach the tier).
+    """
+    matcher = RosterMatcher(roster.rsns(), [member.norm_rsn for member in roster])
+    names = sorted({
+        name
+        for i in range(len(members))
+        for name in members.norm_values(i)
+        if name
+    })
+    names = random.Random(seed).sample(names, min(sample, len(names)))
+    trigram_index = TrigramIndex(matcher.norm_rsns)
+
+    def trigram_lookup(batch):
+        trigram_index.prepare(batch)
+        return [trigram_index.match(name) for name in batch]
+
+    tiers = {
+        "normalized": lambda batch: [matcher.normalized_rsns.get(name) for name in batch],
+        "rsn_contains": lambda batch: [matcher.containment_index.rsns_containing(name) for name in batch],
+        "contains_rsn": lambda batch: [matcher.containment_index.rsns_within(name) for name in batch],
+        "fuzzy": lambda batch: [matcher.fuzzy_index.match(name) for name in batch],
+        "fuzzy_trigram": trigram_lookup
+    }
+    results = {}
+    for tier, lookup in tiers.items():
+        found, seconds = timed(lookup, names)
+        results[tier] = {
+            "seconds": round(seconds, 6),
+            "lookups": len(names),
+            "hits": sum(1 for result in found if result),
+            "us_per_lookup": round(seconds / len(names) * 1e6, 2) if names else None
+        }
+    return results
+
+def bench_size(size, seed=0, workers=1, sample=TIER_SAMPLE, scorer="exact"):
+    """Generate one synthetic clan in a scratch directory and time every stage on it."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="clan_bench_") as workdir:
+        data = generate(workdir, size, seed)
+        os.chdir(workdir)
+        try:
+            stages = {}
+            roster, stages["process_clan_ranks"] = timed(process_clan_ranks, "uploads", "clan_ranks_for_bot.json")
+            renames, stages["compare_clan_files"] = timed(compare_clan_files, data["new_upload"], data["old_upload"])
+            members, stages["load_discord_members"] = timed(DiscordMembers.from_csv, os.path.join("data", "discord_members.csv"))
+            full, stages["match_members_full"] = timed(match_members, roster, members, {}, workers=workers, scorer=scorer)
+            warm, stages["match_members_cached"] = timed(
+                match_members, roster, members, {}, match_cache=full["match_cache"], workers=workers, scorer=scorer
+            )
+            _, stages["update_matched_members"] = timed(update_matched_members, renames, matched_members=full["matched"])
+            tiers = time_tiers(roster, members, sample, seed)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "size": size,
+        "members": data["members"],
+        "discord_rows": data["discord_rows"],
+        "true_renames": data["true_renames"],
+        "renames_found": len(renames),
+        "matched": len(full["matched"]),
+        "unmatched": len(full["unmatched"]),
+        "excluded": len(full["excluded"]),
+        "cache_hits": warm["cache_hits"],
+        "stages": {stage: round(seconds, 6) for stage, seconds in stages.items()},
+        "tiers": tiers
+    }
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes=DEFAULT_SIZES, seed=0, workers=1, sample=TIER_SAMPLE, scorer="exact"):
+    results = []
+    for size in sizes:
+        print(f"⏱️  Benchmarking {size} members...")
+        result = bench_size(size, seed, workers, sample, scorer)
+        for stage, seconds in result["stages"].items():
+            print(f"  {stage:<24} {seconds:10.3f}s")
+        for tier, stats in result["tiers"].items():
+            print(f"  tier {tier:<19} {stats['us_per_lookup']:10.1f}us/lookup ({stats['hits']}/{stats['lookups']} hits)")
+        results.append(result)
+    return {
+        "version": BENCH_VERSION,
+        "revision": git_revision(),
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"seed": seed, "workers": workers, "tier_sample": sample, "scorer": scorer},
+        "results": results
+    }
+
+def compare_results(old, new):
+    """Print new/old time ratios for every stage and tier of the sizes in both runs."""
+    old_by_size = {result["size"]: result for result in old["results"]}
+    print(f"Comparing {new.get('revision')} against {old.get('revision')} (ratio > 1 is slower):")
+    for result in new["results"]:
+        previous = old_by_size.get(result["size"])
+        if previous is None:
+            continue
+        print(f"  size {result['size']}:")
+        for stage, seconds in result["stages"].items():
+            before = previous["stages"].get(stage)
+            if before:
+                print(f"    {stage:<24} {seconds / before:6.2f}x")
+        for tier, stats in result["tiers"].items():
+            before = previous["tiers"].get(tier, {}).get("seconds")
+            if before:
+                print(f"    tier {tier:<19} {stats['seconds'] / before:6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sync stages on synthetic clans.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="roster sizes to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for match_members")
+    parser.add_argument("--scorer", choices=SCORERS, default="exact", help="fuzzy scorer for match_members")
+    parser.add_argument("--sample", type=int, default=TIER_SAMPLE, help="names looked up per tier")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.seed, args.workers, args.sample, args.scorer)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare_results(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
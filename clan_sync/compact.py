@@ -0,0 +1,167 @@
+"""
+Compact, query-ready exports of the roster and match tables.
+
+Written next to the JSON files as minified column arrays:
+
+  clan_ranks_for_bot.compact.json
+  output/matched_members.compact.json
+
+Rows are sorted by RSN. Rank strings are interned into a "ranks" table and
+stored as small ids, joinedDate is stored as a proleptic ordinal day (0 if
+it could not be parsed), and "by_rank" / "by_joined" are precomputed row
+indexes. The match export adds discord columns, interned match types and a
+"by_discord_id" index.
+
+CompactRoster / CompactMatches answer "member by RSN", "members by rank",
+"joined before date" and (for matches) "RSNs by Discord ID" with binary
+searches over the columns, without building a dict per member.
+"""
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from clan_sync.outputs import write_json
+from clan_sync.roster import as_roster, joined_day
+
+COMPACT_VERSION = 1
+CLAN_RANKS_COMPACT_FILE = "clan_ranks_for_bot.compact.json"
+MATCHED_COMPACT_FILE = "output/matched_members.compact.json"
+
+def joined_ordinal(joined_date):
+    return joined_day(joined_date) if isinstance(joined_date, str) else 0
+
+def _intern(values):
+    table = sorted({value for value in values if value is not None})
+    ids = {value: i for i, value in enumerate(table)}
+    return table, [ids.get(value, -1) for value in values]
+
+def _roster_columns(rows, joined):
+    """rows: sorted [(rsn, info)] where info has rank; joined: their ordinal days."""
+    ranks, rank_ids = _intern([info.get("rank") for _, info in rows])
+    by_rank = [[] for _ in ranks]
+    for row, rank_id in enumerate(rank_ids):
+        if rank_id >= 0:
+            by_rank[rank_id].append(row)
+    return {
+        "version": COMPACT_VERSION,
+        "ranks": ranks,
+        "rsn": [rsn for rsn, _ in rows],
+        "rank": rank_ids,
+        "joined": joined,
+        "by_rank": by_rank,
+        "by_joined": sorted(range(len(rows)), key=lambda row: (joined[row], row))
+    }
+
+def build_compact_roster(roster):
+    """Columns for a Roster (or clan_ranks_for_bot.json style dict)."""
+    members = sorted(as_roster(roster), key=lambda member: member.rsn)
+    rows = [(member.rsn, member.to_dict()) for member in members]
+    return _roster_columns(rows, [member.joined_day for member in members])
+
+def build_compact_matches(matched):
+    rows = sorted(matched.items())
+    columns = _roster_columns(rows, [joined_ordinal(info.get("joinedDate")) for _, info in rows])
+    match_types, match_type_ids = _intern([info.get("match_type") for _, info in rows])
+    discord_ids = [info.get("discord_id") or "" for _, info in rows]
+    columns.update({
+        "discord_id": discord_ids,
+        "discord_user": [info.get("discord_user") for _, info in rows],
+        "nickname": [info.get("nickname") for _, info in rows],
+        "match_types": match_types,
+        "match_type": match_type_ids,
+        "ambiguous": [1 if info.get("ambiguous") else 0 for _, info in rows],
+        "by_discord_id": sorted(range(len(rows)), key=lambda row: (discord_ids[row], row))
+    })
+    return columns
+
+def write_compact(columns, path):
+    write_json(path, columns, separators=(",", ":"), ensure_ascii=False)
+
+def write_compact_exports(roster=None, matched=None):
+    """Write the compact files for whichever tables are given."""
+    if roster is not None:
+        write_compact(build_compact_roster(roster), CLAN_RANKS_COMPACT_FILE)
+    if matched is not None:
+        write_compact(build_compact_matches(matched), MATCHED_COMPACT_FILE)
+
+def _as_ordinal(day):
+    if isinstance(day, date):
+        return day.toordinal()
+    if isinstance(day, int):
+        return day
+    return joined_ordinal(day)
+
+class CompactRoster:
+    """Read-only lookups over a compact roster export."""
+
+    def __init__(self, path=CLAN_RANKS_COMPACT_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            self.columns = json.load(f)
+        if self.columns.get("version") != COMPACT_VERSION:
+            raise ValueError(f"Unsupported compact export version in {path}")
+        self.rsns = self.columns["rsn"]
+        self._rank_ids = {rank: i for i, rank in enumerate(self.columns["ranks"])}
+        self._joined_sorted = [self.columns["joined"][row] for row in self.columns["by_joined"]]
+
+    def __len__(self):
+        return len(self.rsns)
+
+    def _row(self, rsn):
+        row = bisect_left(self.rsns, rsn)
+        if row < len(self.rsns) and self.rsns[row] == rsn:
+            return row
+        return None
+
+    def row_info(self, row):
+        rank_id = self.columns["rank"][row]
+        day = self.columns["joined"][row]
+        return {
+            "rank": self.columns["ranks"][rank_id] if rank_id >= 0 else None,
+            "joinedDate": date.fromordinal(day) if day else None
+        }
+
+    def get(self, rsn):
+        """Info for one RSN (joinedDate as a date), or None."""
+        row = self._row(rsn)
+        return None if row is None else self.row_info(row)
+
+    def by_rank(self, rank):
+        """RSNs holding a rank, sorted."""
+        rank_id = self._rank_ids.get(rank)
+        if rank_id is None:
+            return []
+        return [self.rsns[row] for row in self.columns["by_rank"][rank_id]]
+
+    def joined_before(self, day):
+        """
+        RSNs that joined strictly before day (a date, ordinal or
+        "14-Sep-2024" string), oldest first.
+        """
+        start = bisect_right(self._joined_sorted, 0)
+        end = bisect_left(self._joined_sorted, _as_ordinal(day), lo=start)
+        return [self.rsns[row] for row in self.columns["by_joined"][start:end]]
+
+class CompactMatches(CompactRoster):
+    """Read-only lookups over a compact match table export."""
+
+    def __init__(self, path=MATCHED_COMPACT_FILE):
+        super().__init__(path)
+        self._discord_sorted = [self.columns["discord_id"][row] for row in self.columns["by_discord_id"]]
+
+    def row_info(self, row):
+        info = super().row_info(row)
+        match_type_id = self.columns["match_type"][row]
+        info.update({
+            "discord_id": self.columns["discord_id"][row] or None,
+            "discord_user": self.columns["discord_user"][row],
+            "nickname": self.columns["nickname"][row],
+            "match_type": self.columns["match_types"][match_type_id] if match_type_id >= 0 else None,
+            "ambiguous": bool(self.columns["ambiguous"][row])
+        })
+        return info
+
+    def by_discord_id(self, discord_id):
+        """RSNs matched to a Discord ID, sorted."""
+        start = bisect_left(self._discord_sorted, discord_id)
+        end = bisect_right(self._discord_sorted, discord_id, lo=start)
+        return [self.rsns[row] for row in self.columns["by_discord_id"][start:end]]
@@ -0,0 +1,123 @@
+"""
+Columnar table of Discord members, loaded from data/discord_members.csv.
+
+The CSV is streamed once. Each row's roles become an integer bitset against
+a shared role table, so a role check is a single AND, and the normalized
+user, nick and global-name columns used for matching are computed up front.
+Repeated values (roles strings, empty nicknames) are interned.
+"""
+import csv
+import hashlib
+import re
+import sys
+
+from clan_sync.roster import normalize
+
+COLUMNS = ("ID", "User", "Global Display Name", "Nickname", "Roles")
+
+def strip_suffix_digits(name):
+    return re.sub(r'\d{2,4}$', '', name)
+
+def split_roles(roles_raw):
+    return {r.strip() for r in roles_raw.split(",") if r.strip()} if roles_raw else set()
+
+class DiscordMembers:
+    """
+    One list per column, indexed by row in CSV order. Raw columns keep the
+    CSV values (None for cells missing from a short row, like DictReader).
+    """
+
+    __slots__ = (
+        "ids", "users", "global_names", "nicknames", "roles",
+        "role_bits", "role_table", "nicks", "norm_nicks", "norm_globals", "norm_users"
+    )
+
+    def __init__(self):
+        self.ids = []
+        self.users = []
+        self.global_names = []
+        self.nicknames = []
+        self.roles = []
+        self.role_bits = []
+        # role name -> bit position
+        self.role_table = {}
+        # Display nick (Nickname, else Global Display Name, else User)
+        self.nicks = []
+        self.norm_nicks = []
+        self.norm_globals = []
+        self.norm_users = []
+
+    @classmethod
+    def from_csv(cls, path):
+        table = cls()
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            positions = [header.index(column) if column in header else None for column in COLUMNS]
+            for row in reader:
+                if not row:
+                    continue
+                table.append(*(
+                    row[pos] if pos is not None and pos < len(row) else None
+                    for pos in positions
+                ))
+        return table
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from csv.DictReader style dicts."""
+        table = cls()
+        for row in rows:
+            table.append(*(row.get(column) for column in COLUMNS))
+        return table
+
+    def append(self, discord_id, user, global_name, nickname, roles):
+        self.ids.append(discord_id)
+        self.users.append(user)
+        self.global_names.append(global_name)
+        self.nicknames.append(sys.intern(nickname) if nickname is not None else None)
+        self.roles.append(sys.intern(roles) if roles is not None else None)
+        self.role_bits.append(self._role_bits(roles))
+
+        user = user or ""
+        global_name = global_name or ""
+        self.nicks.append(nickname or global_name or user)
+        self.norm_nicks.append(normalize(self.nicks[-1]))
+        self.norm_globals.append(normalize(global_name))
+        self.norm_users.append(normalize(strip_suffix_digits(user)))
+
+    def _role_bits(self, roles_raw):
+        bits = 0
+        for role in split_roles(roles_raw):
+            bit = self.role_table.get(role)
+            if bit is None:
+                bit = self.role_table[role] = len(self.role_table)
+            bits |= 1 << bit
+        return bits
+
+    def role_mask(self, roles):
+        """Bitset of the given role names (roles nobody has are left out)."""
+        mask = 0
+        for role in roles:
+            if role in self.role_table:
+                mask |= 1 << self.role_table[role]
+        return mask
+
+    def __len__(self):
+        return len(self.ids)
+
+    def norm_values(self, i):
+        """(norm_nick, norm_global, norm_user) of row i, as scored by the matcher."""
+        return self.norm_nicks[i], self.norm_globals[i], self.norm_users[i]
+
+    def cache_key(self, i):
+        """Hash of row i's raw columns; any edit to the row invalidates its cached match."""
+        fields = [
+            self.ids[i] or "", self.users[i] or "", self.global_names[i] or "",
+            self.nicknames[i] or "", self.roles[i] or ""
+        ]
+        return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+def as_discord_members(data):
+    """Accept a DiscordMembers table or a list of csv.DictReader rows."""
+    return data if isinstance(data, DiscordMembers) else DiscordMembers.from_rows(data)
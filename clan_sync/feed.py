@@ -0,0 +1,134 @@
+"""
+Versioned change feed next to clan_ranks_for_bot.json.
+
+Every sync that changes the roster bumps the version and writes a small
+patch against the previous version:
+
+  feed/head.json            {"version", "hash", "oldest_version", "full"}
+  feed/patches/<version>.json
+      {"version", "base_version", "base_hash", "hash",
+       "added": {rsn: {"rank", "joinedDate"}}, "removed": [rsn],
+       "renamed": [{"old_rsn", "new_rsn", "rank", "joinedDate"}],
+       "rank_changed": {rsn: rank}, "joinedDate_changed": {rsn: joinedDate}}
+
+A consumer polls head.json and applies the patches after the version it
+has (apply_patch() shows how), checking the result against "hash". If it
+is older than oldest_version it downloads the full file instead.
+"""
+import json
+import os
+
+from clan_sync.history import diff_rosters
+from clan_sync.outputs import remove_output, write_json
+from clan_sync.ranks import CLAN_RANKS_FILE, process_latest_upload, roster_hash
+from clan_sync.renames import renames_from_diff
+
+FEED_DIR = "feed"
+HEAD_FILE = os.path.join(FEED_DIR, "head.json")
+PATCHES_DIR = os.path.join(FEED_DIR, "patches")
+# Older patches are deleted; consumers that far behind re-download the full file
+MAX_PATCHES = 200
+
+def patch_file(version):
+    return os.path.join(PATCHES_DIR, f"{version:06d}.json")
+
+def make_patch(old, new):
+    """Patch turning roster old into roster new (RSN -> {"rank", "joinedDate"})."""
+    diff = diff_rosters(old, new)
+    renamed = [
+        {"old_rsn": r["old_rsn"], "new_rsn": r["new_rsn"], **diff["joined"][r["new_rsn"]]}
+        for r in sorted(renames_from_diff(diff), key=lambda r: r["new_rsn"])
+    ]
+    renamed_old = {r["old_rsn"] for r in renamed}
+    renamed_new = {r["new_rsn"] for r in renamed}
+    return {
+        "added": {rsn: info for rsn, info in diff["joined"].items() if rsn not in renamed_new},
+        "removed": [rsn for rsn in diff["left"] if rsn not in renamed_old],
+        "renamed": renamed,
+        "rank_changed": {
+            rsn: new_info["rank"]
+            for rsn, (old_info, new_info) in diff["changed"].items()
+            if old_info["rank"] != new_info["rank"]
+        },
+        "joinedDate_changed": {
+            rsn: new_info["joinedDate"]
+            for rsn, (old_info, new_info) in diff["changed"].items()
+            if old_info["joinedDate"] != new_info["joinedDate"]
+        }
+    }
+
+def apply_patch(roster, patch):
+    """Apply a patch to a roster dict in place and return it (reference for consumers)."""
+    for rsn in patch["removed"]:
+        roster.pop(rsn, None)
+    for entry in patch["renamed"]:
+        roster.pop(entry["old_rsn"], None)
+        roster[entry["new_rsn"]] = {"rank": entry["rank"], "joinedDate": entry["joinedDate"]}
+    roster.update(patch["added"])
+    for rsn, rank in patch["rank_changed"].items():
+        roster[rsn]["rank"] = rank
+    for rsn, joined_date in patch["joinedDate_changed"].items():
+        roster[rsn]["joinedDate"] = joined_date
+    return roster
+
+def load_head():
+    if not os.path.isfile(HEAD_FILE):
+        return None
+    with open(HEAD_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_published_roster(clan_ranks_file=CLAN_RANKS_FILE):
+    if not os.path.isfile(clan_ranks_file):
+        return None
+    with open(clan_ranks_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def publish(previous, current, current_hash=None):
+    """
+    Publish a new feed version for roster current, with a patch from
+    previous if the head still describes it. Returns the new head, or the
+    old one if the roster did not change. Pass current_hash if it is
+    already known to skip hashing current again.
+    """
+    head = load_head()
+    current_hash = current_hash or roster_hash(current)
+    if head and head["hash"] == current_hash:
+        return head
+
+    os.makedirs(PATCHES_DIR, exist_ok=True)
+    version = head["version"] + 1 if head else 1
+    oldest_version = version
+    if head and previous is not None and head["hash"] == roster_hash(previous):
+        patch = {
+            "version": version,
+            "base_version": head["version"],
+            "base_hash": head["hash"],
+            "hash": current_hash,
+            **make_patch(previous, current)
+        }
+        write_json(patch_file(version), patch, separators=(",", ":"), ensure_ascii=False)
+        oldest_version = max(head["oldest_version"], version - MAX_PATCHES)
+    if head:
+        for old_version in range(head["oldest_version"] + 1, oldest_version + 1):
+            remove_output(patch_file(old_version))
+
+    head = {
+        "version": version,
+        "hash": current_hash,
+        # Consumers at oldest_version or later can catch up with patches
+        "oldest_version": oldest_version,
+        "full": CLAN_RANKS_FILE
+    }
+    write_json(HEAD_FILE, head, indent=2)
+    return head
+
+def process_and_publish(force=False, inputs_hash=None):
+    """Run process_clan_ranks() and publish the change to the feed."""
+    previous = load_published_roster()
+    processed = process_latest_upload(force=force, inputs_hash=inputs_hash)
+    if processed is None:
+        return None
+    clan_data, content_hash = processed
+    head = publish(previous, clan_data.to_dict(), content_hash)
+    print(f"Feed at version {head['version']} ({HEAD_FILE})")
+    return clan_data
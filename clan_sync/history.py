@@ -0,0 +1,225 @@
+"""
+Append-only roster history built from the uploads.
+
+output/roster_history.jsonl holds one minified JSON record per upload, in
+capture order. Every KEYFRAME_INTERVAL records is a keyframe with the full
+roster; the records in between only store the members who joined, left or
+changed rank/joinedDate since the previous upload. Any historical roster is
+rebuilt from the nearest keyframe, and changes between two points can be
+read straight from the deltas.
+
+Records look like:
+  {"upload": "clanrank_....json", "captured_at": "2025-06-07T15:33:47",
+   "roster": {rsn: [rank, joinedDate], ...}}                      (keyframe)
+  {"upload": ..., "captured_at": ...,
+   "joined": {rsn: [rank, joinedDate]}, "left": [rsn, ...],
+   "changed": {rsn: [rank, joinedDate]}}                          (delta)
+
+Usage: python -m clan_sync.history [--rebuild] [--show POINT] [--changes FROM TO]
+"""
+import argparse
+import json
+import os
+
+from clan_sync.outputs import append_output, remove_output
+from clan_sync.roster import Roster
+from clan_sync.uploads import UPLOADS_DIR, clan_uploads, sync_manifest
+
+HISTORY_FILE = os.path.join("output", "roster_history.jsonl")
+KEYFRAME_INTERVAL = 25
+
+def _pack(info):
+    return [info["rank"], info["joinedDate"]]
+
+def _unpack(packed):
+    return {"rank": packed[0], "joinedDate": packed[1]}
+
+def diff_rosters(old, new):
+    """
+    Net difference between two rosters (RSN -> {"rank", "joinedDate"}).
+    Returns joined and left as RSN -> info, changed as RSN -> (old, new).
+    """
+    return {
+        "joined": {rsn: info for rsn, info in new.items() if rsn not in old},
+        "left": {rsn: info for rsn, info in old.items() if rsn not in new},
+        "changed": {
+            rsn: (old[rsn], info)
+            for rsn, info in new.items()
+            if rsn in old and old[rsn] != info
+        }
+    }
+
+def _change_events(record, diff):
+    for rsn, info in diff["joined"].items():
+        yield {**record, "type": "joined", "rsn": rsn, **info}
+    for rsn, info in diff["left"].items():
+        yield {**record, "type": "left", "rsn": rsn, **info}
+    for rsn, (old, new) in diff["changed"].items():
+        event = {**record, "type": "changed", "rsn": rsn, **new}
+        if old["rank"] != new["rank"]:
+            event["old_rank"] = old["rank"]
+        if old["joinedDate"] != new["joinedDate"]:
+            event["old_joinedDate"] = old["joinedDate"]
+        yield event
+
+class RosterHistory:
+    """Reader/appender for the roster history file."""
+
+    def __init__(self, path=HISTORY_FILE, keyframe_interval=KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.records = []
+        self._latest_roster = None
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.records = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self):
+        return len(self.records)
+
+    def uploads(self):
+        return [record["upload"] for record in self.records]
+
+    def resolve(self, point):
+        """
+        Index of a point in history. A point is a record index (negative
+        counts from the end), an upload file name, or an ISO timestamp, which
+        resolves to the last upload captured at or before it.
+        """
+        if isinstance(point, int):
+            return range(len(self.records))[point]
+        for i, record in enumerate(self.records):
+            if record["upload"] == point:
+                return i
+        found = None
+        for i, record in enumerate(self.records):
+            if record["captured_at"] <= point:
+                found = i
+        if found is None:
+            raise KeyError(f"No roster recorded at or before {point}")
+        return found
+
+    def _apply(self, roster, record):
+        if "roster" in record:
+            return {rsn: _unpack(packed) for rsn, packed in record["roster"].items()}
+        for rsn in record["left"]:
+            roster.pop(rsn, None)
+        for rsn, packed in record["joined"].items():
+            roster[rsn] = _unpack(packed)
+        for rsn, packed in record["changed"].items():
+            roster[rsn] = _unpack(packed)
+        return roster
+
+    def roster_at(self, point=-1):
+        """Rebuild the roster (RSN -> {"rank", "joinedDate"}, sorted by RSN) at a point."""
+        index = self.resolve(point)
+        start = index
+        while "roster" not in self.records[start]:
+            start -= 1
+        roster = {}
+        for record in self.records[start:index + 1]:
+            roster = self._apply(roster, record)
+        return dict(sorted(roster.items()))
+
+    def iter_rosters(self, start=0):
+        """Yield (upload, captured_at, roster) for every record from start on, in order."""
+        if not self.records:
+            return
+        first = self.resolve(start)
+        roster = self.roster_at(first - 1) if first else {}
+        for record in self.records[first:]:
+            roster = self._apply(roster, record)
+            yield record["upload"], record["captured_at"], dict(roster)
+
+    def iter_changes(self, start, end=-1):
+        """
+        Yield every join, leave and rank/joinedDate change after `start` up to
+        and including `end`, one event dict per member per upload.
+        """
+        first, last = self.resolve(start), self.resolve(end)
+        roster = self.roster_at(first)
+        for record in self.records[first + 1:last + 1]:
+            meta = {"upload": record["upload"], "captured_at": record["captured_at"]}
+            if "roster" in record:
+                new_roster = self._apply({}, record)
+                yield from _change_events(meta, diff_rosters(roster, new_roster))
+                roster = new_roster
+                continue
+            diff = {
+                "joined": {rsn: _unpack(packed) for rsn, packed in record["joined"].items()},
+                "left": {rsn: roster[rsn] for rsn in record["left"]},
+                "changed": {rsn: (roster[rsn], _unpack(packed)) for rsn, packed in record["changed"].items()}
+            }
+            yield from _change_events(meta, diff)
+            roster = self._apply(roster, record)
+
+    def diff(self, start, end=-1):
+        """Net change between two points (see diff_rosters)."""
+        return diff_rosters(self.roster_at(start), self.roster_at(end))
+
+    def append(self, upload, captured_at, roster):
+        """Record a new upload's roster after the last one."""
+        record = {"upload": upload, "captured_at": captured_at}
+        since_keyframe = 0
+        for previous in reversed(self.records):
+            if "roster" in previous:
+                break
+            since_keyframe += 1
+        if not self.records or since_keyframe + 1 >= self.keyframe_interval:
+            record["roster"] = {rsn: _pack(info) for rsn, info in roster.items()}
+        else:
+            if self._latest_roster is None:
+                self._latest_roster = self.roster_at(-1)
+            diff = diff_rosters(self._latest_roster, roster)
+            record["joined"] = {rsn: _pack(info) for rsn, info in diff["joined"].items()}
+            record["left"] = list(diff["left"])
+            record["changed"] = {rsn: _pack(new) for rsn, (_, new) in diff["changed"].items()}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with append_output(self.path, encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+        self.records.append(record)
+        self._latest_roster = dict(roster)
+        return record
+
+def sync_history(uploads_dir=UPLOADS_DIR, history_file=HISTORY_FILE, rebuild=False):
+    """
+    Append every upload of the primary clan (see clan_sync.uploads) that is
+    not in the history yet.
+    If an upload arrives with a capture time before the last recorded one,
+    the history is rebuilt so it stays in capture order.
+    """
+    entries = clan_uploads(sync_manifest(uploads_dir))
+    history = RosterHistory(history_file)
+    recorded = set(history.uploads())
+    new_entries = [e for e in entries if e["file"] not in recorded]
+    last_captured = history.records[-1]["captured_at"] if history.records else ""
+
+    if rebuild or any(e["captured_at"] < last_captured for e in new_entries):
+        remove_output(history_file)
+        history = RosterHistory(history_file)
+        new_entries = entries
+
+    for entry in new_entries:
+        roster = Roster.load_upload(os.path.join(uploads_dir, entry["file"])).to_dict()
+        history.append(entry["file"], entry["captured_at"], roster)
+    return history
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the roster history.")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the history from all uploads")
+    parser.add_argument("--show", metavar="POINT", help="print the roster at an upload name or ISO timestamp")
+    parser.add_argument("--changes", nargs=2, metavar=("FROM", "TO"), help="print changes between two points")
+    args = parser.parse_args()
+
+    history = sync_history(rebuild=args.rebuild)
+    if args.show:
+        print(json.dumps(history.roster_at(args.show), indent=2))
+    elif args.changes:
+        for event in history.iter_changes(*args.changes):
+            print(json.dumps(event, ensure_ascii=False))
+    else:
+        print(f"{len(history)} uploads in {history.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Stable member identities across RSN changes, built from the roster history.
+
+One linear pass over the upload history gives every member an id the first
+time they appear and follows them through renames: a leaver and a joiner
+with the same joinedDate in the same upload are the same member, a member
+who reappears with the same RSN and joinedDate (give or take the one-day
+timezone skew between uploaders) keeps their id, and a joiner
+can still be paired with an earlier departure when theirs is the only one
+left for that joinedDate. The state is saved after each run, so re-runs only
+scan uploads appended to the history since; if the uploads scanned so far
+are no longer a prefix of the history (an earlier upload was inserted and
+the history rebuilt), everything is rescanned.
+
+Outputs:
+  output/rsn_identities.json     scan state (ids, active RSNs, departures)
+  output/rsn_rename_chains.json  every member with more than one RSN
+  output/identity_links.json     last Discord match of each member id (kept
+                                 by matching, see carried_links())
+
+Usage: python -m clan_sync.identities [--rebuild]
+"""
+import argparse
+import json
+import os
+from itertools import groupby
+
+from clan_sync.history import sync_history
+from clan_sync.outputs import write_json
+from clan_sync.ranks import adjacent_joined_dates
+from clan_sync.renames import pair_renames
+
+IDENTITIES_FILE = os.path.join("output", "rsn_identities.json")
+RENAME_CHAINS_FILE = os.path.join("output", "rsn_rename_chains.json")
+LINKS_FILE = os.path.join("output", "identity_links.json")
+
+class IdentityIndex:
+    """
+    members:  id -> {"joinedDate", "names": [[rsn, first upload], ...], "active"}
+    active:   current RSN -> id
+    departed: joinedDate -> {last RSN: id} for members no longer on the roster
+    scanned:  the uploads scanned so far, in history order
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.scanned = state.get("scanned", [])
+        self.last_upload = state.get("last_upload")
+        self.next_id = state.get("next_id", 1)
+        self.members = state.get("members", {})
+        self.active = state.get("active", {})
+        self.departed = state.get("departed", {})
+
+    def to_state(self):
+        return {
+            "last_upload": self.last_upload,
+            "scanned": self.scanned,
+            "next_id": self.next_id,
+            "members": self.members,
+            "active": self.active,
+            "departed": self.departed
+        }
+
+    def add_member(self, rsn, joined_date, upload):
+        member_id = str(self.next_id)
+        self.next_id += 1
+        self.members[member_id] = {"joinedDate": joined_date, "names": [[rsn, upload]], "active": True}
+        self.active[rsn] = member_id
+        return member_id
+
+    def _find_departed(self, rsn, joined_date):
+        """(departed joinedDate, id) of a departed member with this RSN, or None."""
+        for candidate_date in adjacent_joined_dates(joined_date):
+            member_id = self.departed.get(candidate_date, {}).get(rsn)
+            if member_id is not None:
+                return candidate_date, member_id
+        return None
+
+    def _return(self, member_id, rsn, joined_date, upload, departed_date=None):
+        """Put a departed member back on the roster, under a new RSN if it changed."""
+        departed_date = departed_date or joined_date
+        del self.departed[departed_date][self.members[member_id]["names"][-1][0]]
+        if not self.departed[departed_date]:
+            del self.departed[departed_date]
+        member = self.members[member_id]
+        member["joinedDate"] = joined_date
+        if member["names"][-1][0] != rsn:
+            member["names"].append([rsn, upload])
+        member["active"] = True
+        self.active[rsn] = member_id
+
+    def apply_upload(self, upload, joined, left, redated=(), ranks=None):
+        """
+        Apply one upload's changes. joined and left are (rsn, joinedDate)
+        pairs, redated is (rsn, new joinedDate) for members whose date changed
+        and ranks maps (rsn, joinedDate) -> rank for the joiners and leavers.
+        Returns the renames found, oldest name first.
+        """
+        for rsn, joined_date in sorted(left):
+            member_id = self.active.pop(rsn, None)
+            if member_id is None:
+                continue
+            self.members[member_id]["active"] = False
+            self.departed.setdefault(joined_date, {})[rsn] = member_id
+        for rsn, joined_date in redated:
+            member_id = self.active.get(rsn)
+            if member_id is not None:
+                self.members[member_id]["joinedDate"] = joined_date
+
+        renames = []
+        remaining = []
+        # Same RSN and joinedDate as a departed member: the same member is back
+        for rsn, joined_date in sorted(joined):
+            found = self._find_departed(rsn, joined_date)
+            if found is not None:
+                departed_date, member_id = found
+                self._return(member_id, rsn, joined_date, upload, departed_date)
+            else:
+                remaining.append((rsn, joined_date))
+
+        # Leaver and joiner in this upload with the same joinedDate
+        still_left = {(rsn, jd) for rsn, jd in left if rsn in self.departed.get(jd, {})}
+        for entry in sorted(pair_renames(remaining, still_left, ranks), key=lambda e: e["new_rsn"]):
+            jd = entry["joinedDate"]
+            self._return(self.departed[jd][entry["old_rsn"]], entry["new_rsn"], jd, upload)
+            renames.append({**entry, "upload": upload})
+        paired = {(e["new_rsn"], e["joinedDate"]) for e in renames}
+        remaining = [pair for pair in remaining if pair not in paired]
+
+        # Only departure on record for this joinedDate, even from an earlier upload
+        by_date = {}
+        for rsn, joined_date in remaining:
+            by_date.setdefault(joined_date, []).append(rsn)
+        for joined_date, rsns in sorted(by_date.items()):
+            departed = self.departed.get(joined_date, {})
+            if len(rsns) == 1 and len(departed) == 1:
+                old_rsn, member_id = next(iter(departed.items()))
+                self._return(member_id, rsns[0], joined_date, upload)
+                renames.append({
+                    "joinedDate": joined_date,
+                    "old_rsn": old_rsn,
+                    "new_rsn": rsns[0],
+                    "confidence": 1.0,
+                    "upload": upload
+                })
+            else:
+                for rsn in rsns:
+                    self.add_member(rsn, joined_date, upload)
+
+        self.last_upload = upload
+        return renames
+
+    def chains(self):
+        """Members with more than one RSN, with each RSN and the upload it was first seen in."""
+        return [
+            {
+                "id": member_id,
+                "joinedDate": member["joinedDate"],
+                "current_rsn": member["names"][-1][0],
+                "active": member["active"],
+                "chain": [{"rsn": rsn, "since": upload} for rsn, upload in member["names"]]
+            }
+            for member_id, member in self.members.items()
+            if len(member["names"]) > 1
+        ]
+
+def member_resolver(index, uploads):
+    """
+    resolve(rsn, upload) -> id of the member who had that RSN in that upload
+    (uploads in history order), or None. Lets other scans over the history
+    (clan_sync.tenure) key members by the same ids.
+    """
+    position = {upload: i for i, upload in enumerate(uploads)}
+    holders = {}
+    for member_id, member in index.members.items():
+        for rsn, since in member["names"]:
+            holders.setdefault(rsn, []).append((position.get(since, -1), int(member_id)))
+    for entries in holders.values():
+        entries.sort()
+
+    def resolve(rsn, upload):
+        # The latest member to take the RSN at or before the upload
+        at = position[upload]
+        found = None
+        for since, member_id in holders.get(rsn, ()):
+            if since > at:
+                break
+            found = str(member_id)
+        return found
+    return resolve
+
+def load_identities(identities_file=IDENTITIES_FILE):
+    if not os.path.isfile(identities_file):
+        return IdentityIndex()
+    with open(identities_file, "r", encoding="utf-8") as f:
+        return IdentityIndex(json.load(f))
+
+def load_identity_links(links_file=LINKS_FILE):
+    """member id -> {"rsn", "discord_id", "discord_user", "nickname", "match_type"}"""
+    if not os.path.isfile(links_file):
+        return {}
+    with open(links_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_identity_links(links, links_file=LINKS_FILE):
+    write_json(links_file, dict(sorted(links.items(), key=lambda item: int(item[0]))), indent=2)
+
+def carried_links(index, links):
+    """
+    Current RSN -> link for every active member with a saved Discord link.
+    The identity index follows renames, so a link made under an old RSN
+    comes back under the member's current one.
+    """
+    carried = {}
+    for member_id, link in links.items():
+        member = index.members.get(member_id)
+        if member is not None and member["active"]:
+            carried[member["names"][-1][0]] = link
+    return carried
+
+def link_matches(index, links, matched):
+    """
+    Save the Discord link of every unambiguously matched RSN under its
+    member id. Links of members left unmatched this time are kept.
+    """
+    for rsn, info in matched.items():
+        member_id = index.active.get(rsn)
+        if member_id is None or info["ambiguous"] or not info["discord_id"]:
+            continue
+        previous = links.get(member_id, {})
+        links[member_id] = {
+            "rsn": rsn,
+            "discord_id": info["discord_id"],
+            "discord_user": info["discord_user"],
+            "nickname": info["nickname"],
+            # A carried link keeps the match type it was first made with
+            "match_type": previous.get("match_type", "identity") if info["match_type"] == "identity" else info["match_type"]
+        }
+    return links
+
+def _upload_changes(events):
+    joined, left, redated, ranks = [], [], [], {}
+    for event in events:
+        if event["type"] == "joined":
+            joined.append((event["rsn"], event["joinedDate"]))
+        elif event["type"] == "left":
+            left.append((event["rsn"], event["joinedDate"]))
+        elif "old_joinedDate" in event:
+            redated.append((event["rsn"], event["joinedDate"]))
+        ranks[(event["rsn"], event["joinedDate"])] = event["rank"]
+    return joined, left, redated, ranks
+
+def sync_identities(history=None, rebuild=False):
+    """
+    Scan the uploads added to the history since the last run (all of them
+    if rebuild is set or the uploads already scanned are no longer a prefix
+    of the history) and save the identities and rename chains.
+    Returns (index, renames found in this run).
+    """
+    if history is None:
+        history = sync_history()
+    index = IdentityIndex() if rebuild else load_identities()
+    uploads = history.uploads()
+    if not uploads:
+        return index, []
+
+    if not index.scanned or index.scanned != uploads[:len(index.scanned)]:
+        index = IdentityIndex()
+        for rsn, info in history.roster_at(0).items():
+            index.add_member(rsn, info["joinedDate"], uploads[0])
+        index.scanned = uploads[:1]
+
+    renames = []
+    changes = history.iter_changes(len(index.scanned) - 1, -1)
+    for upload, events in groupby(changes, key=lambda event: event["upload"]):
+        renames.extend(index.apply_upload(upload, *_upload_changes(events)))
+    index.scanned = uploads
+    index.last_upload = uploads[-1]
+
+    write_json(IDENTITIES_FILE, index.to_state(), indent=2)
+    write_json(RENAME_CHAINS_FILE, index.chains(), indent=2)
+    return index, renames
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow members through RSN changes across all uploads.")
+    parser.add_argument("--rebuild", action="store_true", help="rescan the whole upload history")
+    args = parser.parse_args()
+
+    index, renames = sync_identities(rebuild=args.rebuild)
+    print(f"🔁 {len(renames)} RSN changes in newly scanned uploads")
+    for entry in renames:
+        print(f"  {entry['old_rsn']} → {entry['new_rsn']} (joined {entry['joinedDate']}, {entry['upload']})")
+    chains = index.chains()
+    print(f"{len(chains)} members with rename chains (saved to {RENAME_CHAINS_FILE})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Streaming ingestion of Clanmate Export uploads.
+
+iter_clanmates() yields clanMemberMaps entries one at a time from a chunked
+read of the upload, validating the required fields as it goes, so an
+upload is never held in memory as a whole. sorted_members() sorts them by
+RSN in bounded memory (sorted runs spilled to temp files and merged), and
+write_roster_json() streams the result out in the exact
+clan_ranks_for_bot.json format while hashing its canonical form.
+ranks.process_clan_ranks() goes through the same path.
+
+Usage: python -m clan_sync.ingest UPLOAD [OUTPUT]
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import tempfile
+
+from clan_sync.outputs import DiscardOutput, atomic_output
+
+CHUNK_SIZE = 64 * 1024
+# Members sorted in memory before a run is spilled to a temp file
+RUN_SIZE = 50000
+REQUIRED_FIELDS = ("rsn", "rank", "joinedDate")
+
+_decoder = json.JSONDecoder()
+
+class _StreamParser:
+    """Just enough of a JSON tokenizer to walk a top-level object incrementally."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or "" at the end of the file."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected):
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"Expected one of {expected!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_upload(path, list_key="clanMemberMaps", header=None):
+    """
+    Yield the items of the top-level list `list_key` one at a time. Other
+    top-level values (e.g. clanName) are stored in `header` if given.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        parser = _StreamParser(f)
+        parser.take("{")
+        if parser.peek() == "}":
+            return
+        while True:
+            key = parser.value()
+            parser.take(":")
+            if key == list_key:
+                parser.take("[")
+                if parser.peek() == "]":
+                    parser.pos += 1
+                else:
+                    while True:
+                        yield parser.value()
+                        if parser.take(",]") == "]":
+                            break
+            else:
+                value = parser.value()
+                if header is not None:
+                    header[key] = value
+            if parser.take(",}") == "}":
+                break
+
+def iter_clanmates(path, skipped=None):
+    """
+    Yield valid clanMemberMaps entries from an upload. Entries missing any
+    of rsn, rank or joinedDate are skipped (and appended to `skipped` if given).
+    """
+    for entry in iter_upload(path):
+        if isinstance(entry, dict) and all(k in entry for k in REQUIRED_FIELDS):
+            yield entry
+        elif skipped is not None:
+            skipped.append(entry)
+
+def _spill(run):
+    f = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for item in run:
+        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    f.seek(0)
+    return f
+
+def _read_run(f):
+    for line in f:
+        yield tuple(json.loads(line))
+
+def sorted_members(entries, run_size=RUN_SIZE):
+    """
+    Yield (rsn, rank, joinedDate) sorted by RSN from clanMemberMaps entries,
+    keeping the last entry for a repeated RSN. At most run_size members are
+    held in memory; larger inputs are sorted in runs and merged from disk.
+    """
+    runs = []
+    batch = []
+    for seq, entry in enumerate(entries):
+        batch.append((entry["rsn"], seq, entry["rank"], entry["joinedDate"]))
+        if len(batch) >= run_size:
+            batch.sort()
+            runs.append(_spill(batch))
+            batch = []
+    batch.sort()
+
+    if runs:
+        runs.append(_spill(batch))
+        batch = []
+        stream = heapq.merge(*(_read_run(run) for run in runs))
+    else:
+        stream = iter(batch)
+
+    try:
+        previous = None
+        for item in stream:
+            if previous is not None and previous[0] != item[0]:
+                yield previous[0], previous[2], previous[3]
+            previous = item
+        if previous is not None:
+            yield previous[0], previous[2], previous[3]
+    finally:
+        for run in runs:
+            run.close()
+
+def canonical_chunks(members):
+    """Canonical JSON of sorted (rsn, rank, joinedDate) rows, in pieces (see ranks.roster_hash)."""
+    yield "{"
+    separator = ""
+    for rsn, rank, joined_date in members:
+        info = json.dumps({"joinedDate": joined_date, "rank": rank}, separators=(",", ":"), ensure_ascii=False)
+        yield f"{separator}{json.dumps(rsn, ensure_ascii=False)}:{info}"
+        separator = ","
+    yield "}"
+
+def canonical_hash(members):
+    digest = hashlib.sha256()
+    for chunk in canonical_chunks(members):
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+def write_roster_json(members, output_file, keep=None):
+    """
+    Stream sorted (rsn, rank, joinedDate) rows to output_file in the same
+    bytes json.dump(clan_dict, f, indent=2) would write (left alone if unchanged).
+    If keep is given, keep(count, hash) decides once everything is written
+    whether to replace output_file at all.
+    Returns (member count, canonical roster hash).
+    """
+    digest = hashlib.sha256()
+    digest.update(b"{")
+    count = 0
+    with atomic_output(output_file, "w") as f:
+        for rsn, rank, joined_date in members:
+            f.write("{\n  " if count == 0 else ",\n  ")
+            f.write(f'{json.dumps(rsn)}: {{\n    "rank": {json.dumps(rank)},\n    "joinedDate": {json.dumps(joined_date)}\n  }}')
+            info = json.dumps({"joinedDate": joined_date, "rank": rank}, separators=(",", ":"), ensure_ascii=False)
+            digest.update(f"{',' if count else ''}{json.dumps(rsn, ensure_ascii=False)}:{info}".encode("utf-8"))
+            count += 1
+        f.write("\n}" if count else "{}")
+        digest.update(b"}")
+        if keep is not None and not keep(count, digest.hexdigest()):
+            raise DiscardOutput()
+    return count, digest.hexdigest()
+
+def stream_clan_ranks(upload_path, output_file, run_size=RUN_SIZE):
+    """Convert one upload to clan_ranks_for_bot.json format in bounded memory."""
+    return write_roster_json(sorted_members(iter_clanmates(upload_path), run_size), output_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Clanmate Export upload in bounded memory.")
+    parser.add_argument("upload")
+    parser.add_argument("output", nargs="?", default="clan_ranks_for_bot.json")
+    args = parser.parse_args()
+
+    count, content_hash = stream_clan_ranks(args.upload, args.output)
+    print(f"Successfully processed {count} clan members.")
+    print(f"Output saved to {args.output} (roster hash {content_hash})")
+
+if __name__ == "__main__":
+    main()
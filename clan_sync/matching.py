@@ -0,0 +1,672 @@
+"""
+Match OSRS clan RSNs to Discord members.
+
+Members are scored against the roster in priority order (normalized name,
+containment, fuzzy) and the results merged in CSV order so manual matches
+and first-come claims win conflicts.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from clan_sync.discord_members import DiscordMembers, as_discord_members, split_roles
+from clan_sync.identities import carried_links, link_matches, load_identities, load_identity_links, save_identity_links
+from clan_sync.metrics import merge_tier_stats, stage
+from clan_sync.outputs import write_json
+from clan_sync.roster import Roster, as_roster, normalize
+from clan_sync.trigram import TrigramIndex
+
+# Define input and output paths
+DATA_DIR = Path("data")
+OUTPUT_DIR = Path("output")
+CLAN_FILE = Path("clan_ranks_for_bot.json")
+DISCORD_FILE = DATA_DIR / "discord_members.csv"
+MANUAL_MATCHES_FILE = DATA_DIR / "manual_matches.json"
+MATCHED_OUTPUT = OUTPUT_DIR / "matched_members.json"
+UNMATCHED_OUTPUT = OUTPUT_DIR / "unmatched_members.json"
+UNMATCHED_RSN_OUTPUT = OUTPUT_DIR / "unmatched_rsn.json"
+EXCLUDED_OUTPUT = OUTPUT_DIR / "excluded_members.json"
+MATCH_CACHE_FILE = OUTPUT_DIR / "match_cache.json"
+MATCH_OUTPUTS = [MATCHED_OUTPUT, UNMATCHED_OUTPUT, UNMATCHED_RSN_OUTPUT, EXCLUDED_OUTPUT, MATCH_CACHE_FILE]
+
+# Bump when the matching rules change so old cache entries are discarded
+MATCH_CACHE_VERSION = 1
+
+# Fuzzy priority scorers: "exact" finds the best SequenceMatcher candidate,
+# "trigram" only confirms each name's top trigram-similarity candidates
+SCORERS = ("exact", "trigram")
+
+# Define excluded roles
+EXCLUDED_ROLES = {"EasyPoll", "MemberList", "Clan Guest", "Memberlist2.0"}
+
+def is_excluded(row):
+    return bool(EXCLUDED_ROLES & split_roles(row.get("Roles", "")))
+
+def fuzzy_match(name, candidates, threshold=0.85):
+    best_score = 0
+    best_match = None
+    for candidate in candidates:
+        score = SequenceMatcher(None, name.lower(), candidate.lower()).ratio()
+        if score > best_score:
+            best_score = score
+            best_match = candidate
+    return best_match if best_score >= threshold else None
+
+class FuzzyIndex:
+    """
+    Bigram inverted index over normalized RSNs for the fuzzy priority.
+    Returns the same result as fuzzy_match(name, candidates) but only runs
+    SequenceMatcher on candidates that can still reach the threshold.
+    """
+
+    def __init__(self, candidates, threshold=0.85):
+        self.threshold = threshold
+        self.examined = 0          # candidates compared with SequenceMatcher, for metrics
+        self.candidates = []       # distinct candidates, in first-seen order
+        self.by_length = {}        # length -> [candidate id]
+        self.postings = {}         # bigram -> [(candidate id, count)]
+        seen = set()
+        for candidate in candidates:
+            candidate = candidate.lower()
+            if candidate in seen:
+                continue
+            seen.add(candidate)
+            cid = len(self.candidates)
+            self.candidates.append(candidate)
+            self.by_length.setdefault(len(candidate), []).append(cid)
+            for gram, count in self._bigrams(candidate).items():
+                self.postings.setdefault(gram, []).append((cid, count))
+
+    @staticmethod
+    def _bigrams(text):
+        grams = {}
+        for i in range(len(text) - 1):
+            gram = text[i:i + 2]
+            grams[gram] = grams.get(gram, 0) + 1
+        return grams
+
+    def _min_shared_bigrams(self, len_a, len_b):
+        # SequenceMatcher's matched characters form a common subsequence, so a
+        # ratio >= threshold bounds the insert/delete distance between the two
+        # strings. By the q-gram lemma every such edit destroys at most two
+        # bigrams, which gives the minimum number of bigrams they must share.
+        total = len_a + len_b
+        matches = int(self.threshold * total / 2)
+        while matches > 0 and 2.0 * (matches - 1) / total >= self.threshold:
+            matches -= 1
+        while 2.0 * matches / total < self.threshold:
+            matches += 1
+        max_edits = total - 2 * matches
+        return max(len_a, len_b) - 1 - 2 * max_edits
+
+    def match(self, name):
+        name = name.lower()
+        len_a = len(name)
+        if not len_a or not self.candidates:
+            return fuzzy_match(name, self.candidates, self.threshold)
+
+        shared = {}
+        for gram, count in self._bigrams(name).items():
+            for cid, cand_count in self.postings.get(gram, ()):
+                shared[cid] = shared.get(cid, 0) + min(count, cand_count)
+
+        pruned = []
+        for len_b, ids in self.by_length.items():
+            # Same bound as SequenceMatcher.real_quick_ratio()
+            if 2.0 * min(len_a, len_b) / (len_a + len_b) < self.threshold:
+                continue
+            required = self._min_shared_bigrams(len_a, len_b)
+            if required <= 0:
+                pruned.extend(ids)
+            else:
+                pruned.extend(cid for cid in ids if shared.get(cid, 0) >= required)
+
+        best_score = 0
+        best_match = None
+        self.examined += len(pruned)
+        for cid in sorted(pruned):
+            matcher = SequenceMatcher(None, name, self.candidates[cid])
+            upper_bound = matcher.quick_ratio()
+            if upper_bound < self.threshold or upper_bound <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_score = score
+                best_match = self.candidates[cid]
+        return best_match if best_score >= self.threshold else None
+
+class ContainmentIndex:
+    """
+    Substring lookups over normalized RSNs for the containment priorities.
+    A sorted suffix table answers "which RSNs contain this name" and an
+    Aho-Corasick automaton answers "which RSNs occur inside this name".
+    Both return original RSNs in roster order, duplicates included.
+    """
+
+    def __init__(self, rsns, norm_rsns=None):
+        self.rsns = list(rsns)
+        if norm_rsns is None:
+            norm_rsns = [normalize(rsn) for rsn in self.rsns]
+        patterns = {}              # normalized rsn -> [roster positions]
+        self.empty = []            # RSNs that normalize to "" occur in every name
+        for pos, norm in enumerate(norm_rsns):
+            if norm:
+                patterns.setdefault(norm, []).append(pos)
+            else:
+                self.empty.append(pos)
+        self.patterns = list(patterns.items())
+
+        # Suffix table: every suffix of every distinct normalized RSN, sorted
+        suffixes = sorted(
+            (norm[i:], pid)
+            for pid, (norm, _) in enumerate(self.patterns)
+            for i in range(len(norm))
+        )
+        self.suffix_keys = [suffix for suffix, _ in suffixes]
+        self.suffix_ids = [pid for _, pid in suffixes]
+
+        # Aho-Corasick automaton over the distinct normalized RSNs
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pid, (norm, _) in enumerate(self.patterns):
+            state = 0
+            for char in norm:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(pid)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def _expand(self, pattern_ids, extra=()):
+        positions = list(extra)
+        for pid in pattern_ids:
+            positions.extend(self.patterns[pid][1])
+        return [self.rsns[pos] for pos in sorted(positions)]
+
+    def rsns_containing(self, name):
+        """RSNs whose normalized form contains the normalized name."""
+        if not name:
+            return list(self.rsns)
+        lo = bisect_left(self.suffix_keys, name)
+        found = set()
+        for i in range(lo, len(self.suffix_keys)):
+            if not self.suffix_keys[i].startswith(name):
+                break
+            found.add(self.suffix_ids[i])
+        return self._expand(found)
+
+    def rsns_within(self, name):
+        """RSNs whose normalized form occurs inside the normalized name."""
+        found = set()
+        state = 0
+        for char in name:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found.update(self.output[state])
+        return self._expand(found, self.empty)
+
+class RosterMatcher:
+    """
+    Prebuilt lookups over one roster. score() runs priorities 1-6 for a
+    single Discord member and only reads these indexes, so members can be
+    scored in any order or in separate processes.
+    """
+
+    def __init__(self, rsns, norm_rsns=None, scorer="exact"):
+        self.rsns = list(rsns)
+        if norm_rsns is None:
+            norm_rsns = [normalize(rsn) for rsn in self.rsns]
+        self.norm_rsns = list(norm_rsns)
+        self.normalized_rsns = dict(zip(self.norm_rsns, self.rsns))
+        self.scorer = scorer
+        if scorer == "trigram":
+            self.fuzzy_index = TrigramIndex(self.norm_rsns)
+        else:
+            self.fuzzy_index = FuzzyIndex(self.norm_rsns)
+        self.containment_index = ContainmentIndex(self.rsns, self.norm_rsns)
+
+    def _lookup(self, stats, tier, lookup, name):
+        """lookup(name), recording time, candidates and hits for the tier in stats if given."""
+        if stats is None:
+            return lookup(name)
+        examined = self.fuzzy_index.examined
+        start = time.perf_counter()
+        result = lookup(name)
+        seconds = time.perf_counter() - start
+        if lookup == self.fuzzy_index.match:
+            candidates = self.fuzzy_index.examined - examined
+        elif isinstance(result, list):
+            candidates = len(result)
+        else:
+            candidates = 1
+        entry = stats.setdefault(tier, {"lookups": 0, "seconds": 0.0, "candidates": 0, "hits": 0})
+        entry["lookups"] += 1
+        entry["seconds"] += seconds
+        entry["candidates"] += candidates
+        entry["hits"] += 1 if result else 0
+        return result
+
+    def score(self, norm_nick, norm_global, norm_user, stats=None):
+        """
+        Returns (match, match_type, ambiguous); match is an RSN, a list of
+        RSNs or None. If stats is a dict, per-tier counters are added to it
+        (see clan_sync.metrics).
+        """
+        normalized_rsns = self.normalized_rsns
+        match = None
+        match_type = None
+        ambiguous = False
+
+        # Priorities 1-3: normalized match with nickname, global name, username
+        for norm_val, label in [(norm_nick, "nickname"), (norm_global, "globalname"), (norm_user, "username")]:
+            match = self._lookup(stats, f"normalized_{label}", normalized_rsns.get, norm_val)
+            if match:
+                match_type = f"normalized_{label}"
+                break
+
+        # Priority 4: RSN contains nickname/global/user
+        for norm_val, label in [(norm_nick, "nick"), (norm_global, "global"), (norm_user, "user")]:
+            if not match and norm_val:
+                candidates = self._lookup(stats, f"rsn_contains_{label}", self.containment_index.rsns_containing, norm_val)
+                if len(candidates) == 1:
+                    match = candidates[0]
+                    match_type = f"rsn_contains_{label}"
+                    break
+                elif len(candidates) > 1:
+                    match = candidates
+                    match_type = f"rsn_contains_{label}"
+                    ambiguous = True
+                    break
+
+        # Priority 5: Nickname/global/user contains RSN
+        for norm_val, label in [(norm_nick, "nick"), (norm_global, "global"), (norm_user, "user")]:
+            if not match and norm_val:
+                candidates = self._lookup(stats, f"{label}_contains_rsn", self.containment_index.rsns_within, norm_val)
+                if len(candidates) == 1:
+                    match = candidates[0]
+                    match_type = f"{label}_contains_rsn"
+                    break
+                elif len(candidates) > 1:
+                    match = candidates
+                    match_type = f"{label}_contains_rsn"
+                    ambiguous = True
+                    break
+
+        # Priority 6: Fuzzy match nickname/global/user
+        for norm_val, label in [(norm_nick, "fuzzy_nickname"), (norm_global, "fuzzy_globalname"), (norm_user, "fuzzy_username")]:
+            if not match and norm_val:
+                fuzzy = self._lookup(stats, label, self.fuzzy_index.match, norm_val)
+                if fuzzy:
+                    match = normalized_rsns[fuzzy]
+                    match_type = label
+
+        return match, match_type, ambiguous
+
+    def score_batch(self, pending, stats=None):
+        """score() for a list of (norm_nick, norm_global, norm_user) tuples, in order."""
+        if self.scorer == "trigram":
+            # One batched lookup for every name the fuzzy priority might need
+            self.fuzzy_index.prepare(name for norm_values in pending for name in norm_values)
+        return [self.score(*norm_values, stats=stats) for norm_values in pending]
+
+# === Worker processes ===
+# Set to the parent's prebuilt matcher while a forked pool runs, so workers
+# inherit its indexes instead of rebuilding them
+_worker_matcher = None
+
+def _init_worker(rsns, norm_rsns, scorer="exact"):
+    # Without fork (spawn-only platforms) each worker has to build its own
+    global _worker_matcher
+    _worker_matcher = RosterMatcher(rsns, norm_rsns, scorer)
+
+def _score_in_worker(chunk, collect_stats=False):
+    stats = {} if collect_stats else None
+    return _worker_matcher.score_batch(chunk, stats), stats
+
+def score_members(matcher, pending, workers=1, stats=None):
+    """
+    Score a list of (norm_nick, norm_global, norm_user) tuples, in order.
+    Per-tier counters from every worker are added to stats if given.
+    """
+    global _worker_matcher
+    if workers > 1 and len(pending) > 1:
+        size = max(1, len(pending) // (workers * 4))
+        chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+        if "fork" in multiprocessing.get_all_start_methods():
+            _worker_matcher = matcher
+            pool_options = {"mp_context": multiprocessing.get_context("fork")}
+        else:
+            pool_options = {"initializer": _init_worker, "initargs": (matcher.rsns, matcher.norm_rsns, matcher.scorer)}
+        results = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers, **pool_options) as executor:
+                for chunk_results, chunk_stats in executor.map(_score_in_worker, chunks, [stats is not None] * len(chunks)):
+                    results.extend(chunk_results)
+                    if chunk_stats:
+                        merge_tier_stats(stats, chunk_stats)
+        finally:
+            _worker_matcher = None
+        return results
+    return matcher.score_batch(pending, stats)
+
+# === Incremental match cache ===
+# Entries hold each member's priority 1-6 result for the roster it was computed
+# against. They are reused as long as no RSN that could affect that member was
+# added to or removed from the roster since.
+def roster_fingerprint(rsns, norm_rsns=None):
+    if norm_rsns is None:
+        norm_rsns = [normalize(rsn) for rsn in rsns]
+    roster = "\n".join(f"{rsn}\t{norm}" for rsn, norm in zip(rsns, norm_rsns))
+    return hashlib.sha1(roster.encode("utf-8")).hexdigest()
+
+def match_settings(matcher):
+    settings = f"{MATCH_CACHE_VERSION}|{matcher.fuzzy_index.threshold}|{','.join(sorted(EXCLUDED_ROLES))}"
+    # Existing caches were all built by the exact scorer
+    return settings if matcher.scorer == "exact" else f"{settings}|{matcher.scorer}"
+
+def roster_changed(norm_values, changed_norms, threshold):
+    """True if an added or removed RSN could change this member's result."""
+    for changed in changed_norms:
+        if not changed:
+            return True
+        for norm_val in norm_values:
+            if not norm_val:
+                continue
+            if changed in norm_val or norm_val in changed:
+                return True
+            if SequenceMatcher(None, norm_val, changed).ratio() >= threshold:
+                return True
+    return False
+
+def reusable_cache_entries(match_cache, matcher):
+    """
+    Returns (entries, changed_norms): the cached entries that may be reused
+    for this roster and the normalized RSNs added or removed since.
+    """
+    if not match_cache or match_cache.get("settings") != match_settings(matcher):
+        return {}, set()
+    if match_cache.get("fingerprint") == roster_fingerprint(matcher.rsns, matcher.norm_rsns):
+        return match_cache.get("entries", {}), set()
+
+    previous_rsns = match_cache.get("roster", [])
+    previous_set, current_set = set(previous_rsns), set(matcher.rsns)
+    # Reordering the surviving RSNs changes candidate order, so only diff
+    # rosters that differ by additions and removals.
+    if [rsn for rsn in previous_rsns if rsn in current_set] != [rsn for rsn in matcher.rsns if rsn in previous_set]:
+        return {}, set()
+    return match_cache.get("entries", {}), {normalize(rsn) for rsn in previous_set ^ current_set}
+
+def match_members(clan_data, discord_members, manual_matches, match_cache=None, workers=1, scorer="exact", metrics=None, matcher=None, carried=None):
+    """
+    Match the roster in clan_data (a Roster or clan_ranks_for_bot.json style
+    dict) to discord_members (a DiscordMembers table or csv.DictReader rows).
+    Returns a dict with the matched, unmatched, unmatched_rsn and excluded
+    tables, the updated match_cache and the number of cache_hits.
+    Stage timings and per-tier counters go to metrics if given. A
+    RosterMatcher already built for this roster (e.g. kept warm by
+    clan_sync.watch) is reused instead of rebuilding the indexes.
+    carried maps RSN -> saved Discord link (see identities.carried_links):
+    an RSN nothing else matched gets its link back ("identity" match) if
+    that Discord member is still unmatched, so a renamed member keeps
+    their Discord match without their nickname having to follow.
+    """
+    matched = {}
+    unmatched = []
+    excluded = []
+    roster = as_roster(clan_data)
+    members = as_discord_members(discord_members)
+    excluded_mask = members.role_mask(EXCLUDED_ROLES)
+    with stage(metrics, "matching.index"):
+        if matcher is None or matcher.scorer != scorer or matcher.rsns != roster.rsns():
+            matcher = RosterMatcher(roster.rsns(), [member.norm_rsn for member in roster], scorer)
+    matched_rsn_set = set()
+
+    cache_entries, changed_norms = reusable_cache_entries(match_cache, matcher)
+    new_cache_entries = {}
+    cache_hits = 0
+
+    # Add manual matches first
+    for rsn, match_info in manual_matches.items():
+        matched[rsn] = {
+            "discord_id": match_info.get("discord_id"),
+            "discord_user": match_info.get("discord_user"),
+            "nickname": match_info.get("nickname"),
+            "match_type": "manual",
+            "ambiguous": False,
+            "rank": roster.rank(rsn),
+            "joinedDate": roster.joined_date(rsn)
+        }
+        matched_rsn_set.add(rsn)
+
+    # === Skip already manually matched Discord IDs ===
+    manually_matched_ids = {m["discord_id"] for m in matched.values()}
+    skipped = [
+        discord_id in manually_matched_ids or bits & excluded_mask
+        for discord_id, bits in zip(members.ids, members.role_bits)
+    ]
+    keys = [None if skip else members.cache_key(i) for i, skip in enumerate(skipped)]
+
+    # Pass 1: reuse cached results and collect the members that need scoring
+    pending = {}
+    with stage(metrics, "matching.cache"):
+        for i, key in enumerate(keys):
+            if key is None or key in new_cache_entries or key in pending:
+                continue
+            norm_values = members.norm_values(i)
+            cached = cache_entries.get(key)
+            if cached is not None and not roster_changed(norm_values, changed_norms, matcher.fuzzy_index.threshold):
+                new_cache_entries[key] = cached
+                cache_hits += 1
+            else:
+                pending[key] = norm_values
+
+    # Pass 2: score the remaining members, in worker processes if requested.
+    # Scoring only reads the roster indexes, so the order results arrive in
+    # does not matter; conflicts are resolved by the merge below.
+    tier_stats = {} if metrics is not None else None
+    with stage(metrics, "matching.score"):
+        results = score_members(matcher, list(pending.values()), workers, tier_stats)
+    for key, (match, match_type, ambiguous) in zip(pending, results):
+        new_cache_entries[key] = {"match": match, "match_type": match_type, "ambiguous": ambiguous}
+    if metrics is not None:
+        metrics.add_tier_stats(tier_stats)
+        metrics.count("discord_members", len(members))
+        metrics.count("excluded_or_manual", keys.count(None))
+        metrics.count("cache_hits", cache_hits)
+        metrics.count("members_scored", len(pending))
+
+    # Pass 3: merge in CSV order. Manual matches win, then the first member to
+    # claim an RSN keeps it.
+    for i, key in enumerate(keys):
+        discord_id = members.ids[i]
+        if discord_id in manually_matched_ids:
+            continue
+
+        if key is None:
+            excluded.append({
+                "discord_id": discord_id,
+                "discord_user": members.users[i],
+                "nickname": members.nicknames[i],
+                "status": "excluded",
+                "reason": "has excluded role"
+            })
+            continue
+
+        user, nick = members.users[i] or "", members.nicks[i]
+        result = new_cache_entries[key]
+        match, match_type, ambiguous = result["match"], result["match_type"], result["ambiguous"]
+
+        if match:
+            if isinstance(match, list):
+                for m in match:
+                    if m not in matched:
+                        matched[m] = {
+                            "discord_id": discord_id,
+                            "discord_user": user,
+                            "nickname": nick,
+                            "match_type": match_type,
+                            "ambiguous": True,
+                            "rank": roster.rank(m),
+                            "joinedDate": roster.joined_date(m)
+                        }
+                        matched_rsn_set.add(m)
+            else:
+                if match not in matched:
+                    matched[match] = {
+                        "discord_id": discord_id,
+                        "discord_user": user,
+                        "nickname": nick,
+                        "match_type": match_type,
+                        "ambiguous": ambiguous,
+                        "rank": roster.rank(match),
+                        "joinedDate": roster.joined_date(match)
+                    }
+                    matched_rsn_set.add(match)
+        else:
+            unmatched.append({
+                "discord_id": discord_id,
+                "discord_user": user,
+                "nickname": nick,
+                "status": "unmatched",
+                "reason": "no match"
+            })
+
+    # Pass 4: links carried through renames, for RSNs still unmatched
+    if carried:
+        unmatched_by_id = {entry["discord_id"]: entry for entry in unmatched}
+        for rsn, link in sorted(carried.items()):
+            entry = unmatched_by_id.get(link["discord_id"])
+            if entry is None or rsn in matched or rsn not in roster:
+                continue
+            matched[rsn] = {
+                "discord_id": entry["discord_id"],
+                "discord_user": entry["discord_user"],
+                "nickname": entry["nickname"],
+                "match_type": "identity",
+                "ambiguous": False,
+                "rank": roster.rank(rsn),
+                "joinedDate": roster.joined_date(rsn)
+            }
+            matched_rsn_set.add(rsn)
+            del unmatched_by_id[link["discord_id"]]
+        unmatched = [entry for entry in unmatched if entry["discord_id"] in unmatched_by_id]
+        if metrics is not None:
+            metrics.count("identity_matches", sum(info["match_type"] == "identity" for info in matched.values()))
+
+    # Determine RSNs with no matching Discord
+    unmatched_rsn = [
+        {"rsn": rsn, "status": "unmatched", "reason": "no matching Discord account"}
+        for rsn in matcher.rsns if rsn not in matched_rsn_set
+    ]
+
+    return {
+        "matched": matched,
+        "unmatched": unmatched,
+        "unmatched_rsn": unmatched_rsn,
+        "excluded": excluded,
+        "match_cache": {
+            "settings": match_settings(matcher),
+            "fingerprint": roster_fingerprint(matcher.rsns, matcher.norm_rsns),
+            "roster": matcher.rsns,
+            "entries": new_cache_entries
+        },
+        "cache_hits": cache_hits
+    }
+
+def inputs_fingerprint(discord_file=DISCORD_FILE, manual_file=MANUAL_MATCHES_FILE):
+    """Hash of the Discord export and the manual matches, so a sync with an unchanged roster still reruns when they change."""
+    digest = hashlib.sha256()
+    for path in (discord_file, manual_file):
+        digest.update(Path(path).read_bytes() if os.path.isfile(path) else b"missing")
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def load_clan_data(clan_file=CLAN_FILE):
+    return Roster.load(clan_file)
+
+def load_discord_members(discord_file=DISCORD_FILE):
+    return DiscordMembers.from_csv(discord_file)
+
+def load_manual_matches(manual_matches_file=MANUAL_MATCHES_FILE):
+    if not Path(manual_matches_file).exists():
+        return {}
+    with open(manual_matches_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_match_cache(match_cache_file=MATCH_CACHE_FILE):
+    if not Path(match_cache_file).exists():
+        return None
+    with open(match_cache_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_match_results(results):
+    """Write the match tables and cache to output/ (see MATCH_OUTPUTS)."""
+    tables = [results["matched"], results["unmatched"], results["unmatched_rsn"], results["excluded"], results["match_cache"]]
+    for path, data in zip(MATCH_OUTPUTS, tables):
+        write_json(path, data, indent=2)
+
+def run_matching(clan_data=None, discord_members=None, full=False, workers=1, scorer="exact", metrics=None, identities=None):
+    """
+    Load whatever inputs were not passed in, match, and write the results.
+    Discord links are carried through renames using the identity index and
+    the saved links are updated with this run's matches.
+    workers=0 uses one process per CPU core.
+    """
+    with stage(metrics, "matching.load"):
+        if clan_data is None:
+            clan_data = load_clan_data()
+        # Streaming the CSV also normalizes every name column
+        if discord_members is None:
+            discord_members = load_discord_members()
+        match_cache = None if full else load_match_cache()
+        manual_matches = load_manual_matches()
+        if identities is None:
+            identities = load_identities()
+        links = load_identity_links()
+
+    results = match_members(
+        clan_data,
+        discord_members,
+        manual_matches,
+        match_cache=match_cache,
+        workers=workers or os.cpu_count() or 1,
+        scorer=scorer,
+        metrics=metrics,
+        carried=carried_links(identities, links)
+    )
+    with stage(metrics, "matching.write"):
+        write_match_results(results)
+        link_matches(identities, links, results["matched"])
+        if links:
+            save_identity_links(links)
+
+    print(f"Matched: {len(results['matched'])}")
+    print(f"Unmatched Discord users: {len(results['unmatched'])}")
+    print(f"Unmatched RSNs: {len(results['unmatched_rsn'])}")
+    print(f"Excluded Discord users: {len(results['excluded'])}")
+    print(f"Match cache hits: {results['cache_hits']}/{len(results['match_cache']['entries'])}")
+    return results
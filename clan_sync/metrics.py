@@ -0,0 +1,215 @@
+"""
+Pipeline instrumentation: wall time and peak memory per stage, per-tier
+matching counters and cache hits, written to output/pipeline_metrics.json.
+
+Stages nest (e.g. "matching" contains "matching.score"); each records its
+own wall time. Memory tracing is opt-in (trace_memory=True, --trace-memory
+on the CLIs): tracemalloc slows the run several times over and inflates
+every timing, so by default stages record no peak and only the process's
+max RSS is reported. With trace_memory=True each stage also records the
+peak traced Python memory while it ran. With
+profile=True the whole run is also captured with cProfile to
+output/pipeline_profile.pstats and the top functions are listed in the
+metrics file.
+
+Every entry point takes an optional metrics argument; stage(metrics, name)
+is a no-op when it is None. Work done in other processes (e.g. the shards
+of clan_sync.shards) collects its own metrics and is folded in with
+merge() and add_profile().
+"""
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+METRICS_FILE = os.path.join("output", "pipeline_metrics.json")
+PROFILE_FILE = os.path.join("output", "pipeline_profile.pstats")
+PROFILE_TOP = 25
+
+class PipelineMetrics:
+    def __init__(self, command, trace_memory=False, profile=False):
+        self.command = command
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages = {}           # name -> {"seconds", "peak_bytes"} in the order stages started
+        self.counters = {}         # name -> int
+        self.tiers = {}            # match tier -> {"lookups", "seconds", "candidates", "hits"}
+        self._stack = []           # [name, start, peak seen so far] of the open stages
+        self._profiler = None
+        self._merged_profiles = None   # pstats.Stats of captures from other processes
+        self._start = None
+        self.total_seconds = 0.0
+        self.peak_bytes = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        self.total_seconds = time.perf_counter() - self._start
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "peak_bytes": None})
+        if self.trace_memory and tracemalloc.is_tracing():
+            # Fold the peak so far into the enclosing stage before resetting it
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append([name, time.perf_counter(), 0])
+        try:
+            yield
+        finally:
+            _, start, peak = self._stack.pop()
+            entry["seconds"] += time.perf_counter() - start
+            if self.trace_memory and tracemalloc.is_tracing():
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                entry["peak_bytes"] = max(entry["peak_bytes"] or 0, peak)
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], peak)
+
+    def add_stage(self, name, seconds, peak_bytes=None):
+        """Record a stage timed somewhere else, e.g. in a worker process."""
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "peak_bytes": None})
+        entry["seconds"] += seconds
+        if peak_bytes is not None:
+            entry["peak_bytes"] = max(entry["peak_bytes"] or 0, peak_bytes)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_tier_stats(self, tier_stats):
+        merge_tier_stats(self.tiers, tier_stats)
+
+    def merge(self, report):
+        """
+        Add the stages, tiers and counters of another run, as in to_dict()
+        (stage times add up, peaks take the max).
+        """
+        for name, entry in report["stages"].items():
+            self.add_stage(name, entry["seconds"], entry["peak_bytes"])
+        self.add_tier_stats(report["tiers"])
+        for name, value in report["counters"].items():
+            self.count(name, value)
+
+    def add_profile(self, profile_file):
+        """Merge a cProfile capture written by another process into this run's."""
+        if self._merged_profiles is None:
+            self._merged_profiles = pstats.Stats(profile_file, stream=io.StringIO())
+        else:
+            self._merged_profiles.add(profile_file)
+
+    def dump_profile(self, profile_file=PROFILE_FILE):
+        self._profile_stats().dump_stats(profile_file)
+
+    def _profile_stats(self):
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        if self._merged_profiles is not None:
+            stats.add(self._merged_profiles)
+        return stats
+
+    def profile_top(self, limit=PROFILE_TOP):
+        """The functions with the highest cumulative time, from the cProfile capture."""
+        if self._profiler is None:
+            return None
+        stats = self._profile_stats()
+        stats.sort_stats("cumulative")
+        top = []
+        for func in stats.fcn_list[:limit]:
+            calls, primitive_calls, total, cumulative, _ = stats.stats[func]
+            filename, line, function = func
+            top.append({
+                "function": f"{os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename}:{line}({function})",
+                "calls": calls,
+                "total_seconds": round(total, 6),
+                "cumulative_seconds": round(cumulative, 6)
+            })
+        return top
+
+    def to_dict(self):
+        report = {
+            "command": self.command,
+            "started_at": self.started_at,
+            "python": sys.version.split()[0],
+            "total_seconds": round(self.total_seconds, 6),
+            "peak_traced_bytes": self.peak_bytes,
+            # ru_maxrss is in kilobytes on Linux
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            "stages": {
+                name: {"seconds": round(entry["seconds"], 6), "peak_bytes": entry["peak_bytes"]}
+                for name, entry in self.stages.items()
+            },
+            "tiers": {
+                tier: {**entry, "seconds": round(entry["seconds"], 6)}
+                for tier, entry in self.tiers.items()
+            },
+            "counters": self.counters
+        }
+        if self._profiler is not None:
+            report["profile_file"] = PROFILE_FILE
+            report["profile_top"] = self.profile_top()
+        return report
+
+    def write(self, metrics_file=METRICS_FILE):
+        os.makedirs(os.path.dirname(metrics_file), exist_ok=True)
+        with open(metrics_file, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        if self._profiler is not None:
+            self.dump_profile()
+
+    def summary(self):
+        lines = [f"⏱️  {self.command}: {self.total_seconds:.3f}s"]
+        for name, entry in self.stages.items():
+            peak = f"{entry['peak_bytes'] / 1e6:8.1f} MB" if entry["peak_bytes"] is not None else ""
+            lines.append(f"  {name:<28} {entry['seconds']:8.3f}s {peak}")
+        for tier, entry in self.tiers.items():
+            lines.append(
+                f"  tier {tier:<23} {entry['seconds']:8.3f}s "
+                f"{entry['hits']}/{entry['lookups']} hits, {entry['candidates']} candidates"
+            )
+        return "\n".join(lines)
+
+def stage(metrics, name):
+    """metrics.stage(name), or a no-op if metrics is None."""
+    return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
+
+def merge_tier_stats(into, tier_stats):
+    for tier, entry in tier_stats.items():
+        total = into.setdefault(tier, {"lookups": 0, "seconds": 0.0, "candidates": 0, "hits": 0})
+        for key, value in entry.items():
+            total[key] += value
+    return into
+
+@contextlib.contextmanager
+def instrumented(command, profile=False, trace_memory=False, metrics_file=METRICS_FILE):
+    """Collect metrics for the enclosed run, then write and print them."""
+    metrics = PipelineMetrics(command, trace_memory=trace_memory, profile=profile)
+    metrics.start()
+    try:
+        yield metrics
+    finally:
+        metrics.stop()
+        metrics.write(metrics_file)
+        print(metrics.summary())
+        print(f"Metrics saved to {metrics_file}")
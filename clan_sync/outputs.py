@@ -0,0 +1,138 @@
+"""
+Write-if-changed output layer shared by every stage.
+
+Outputs are written to a temp file next to the target and only moved into
+place when the bytes differ from what is already there, so an unchanged
+artifact is never rewritten (and never shows up in git). Every write,
+append and removal is recorded, so a run can report which artifacts
+actually changed and commit exactly those, once.
+"""
+import contextlib
+import filecmp
+import json
+import os
+import subprocess
+import tempfile
+
+# path -> "created", "updated", "appended", "removed" or "unchanged", for this process
+_results = {}
+
+class DiscardOutput(Exception):
+    """Raised inside atomic_output() to drop what was written and leave the target alone."""
+
+def _default_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def _record(path, result):
+    path = os.path.normpath(path)
+    # Anything that changed earlier in the run stays changed
+    if _results.get(path, "unchanged") == "unchanged" or result != "unchanged":
+        _results[path] = result
+
+@contextlib.contextmanager
+def atomic_output(path, mode="w", **open_kwargs):
+    """
+    Open a temp file for writing path. On a clean exit it replaces path if
+    its contents differ, otherwise it is discarded (as it is when the block
+    raises DiscardOutput). Yields the file object.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+        existed = os.path.isfile(path)
+        if existed and filecmp.cmp(temp_path, path, shallow=False):
+            os.remove(temp_path)
+            _record(path, "unchanged")
+            return
+        if existed:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+        else:
+            os.chmod(temp_path, _default_mode())
+        os.replace(temp_path, path)
+        _record(path, "updated" if existed else "created")
+    except BaseException as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if not isinstance(e, DiscardOutput):
+            raise
+
+def write_json(path, data, **dump_kwargs):
+    """json.dump data to path if the result differs. Returns True if the file changed."""
+    with atomic_output(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_kwargs)
+    return output_changed(path)
+
+@contextlib.contextmanager
+def append_output(path, **open_kwargs):
+    """Open path for appending and record it as changed if anything was written."""
+    size = os.path.getsize(path) if os.path.isfile(path) else None
+    with open(path, "a", **open_kwargs) as f:
+        yield f
+    if size is None:
+        _record(path, "created")
+    elif os.path.getsize(path) != size:
+        _record(path, "appended")
+
+def remove_output(path):
+    """Remove an output file if it exists, recording the removal."""
+    if os.path.isfile(path):
+        os.remove(path)
+        _record(path, "removed")
+
+def output_changed(path):
+    return _results.get(os.path.normpath(path), "unchanged") != "unchanged"
+
+def changed_outputs():
+    """{path: what happened} for every output that changed in this process."""
+    return {path: result for path, result in _results.items() if result != "unchanged"}
+
+def recorded_outputs():
+    """{path: what happened} for every output written in this process, changed or not."""
+    return dict(_results)
+
+def record_outputs(results):
+    """Record outputs written by another process (e.g. a shard worker), as returned by recorded_outputs()."""
+    for path, result in results.items():
+        _record(path, result)
+
+def reset_outputs():
+    _results.clear()
+
+def report_changes():
+    changed = changed_outputs()
+    unchanged = len(_results) - len(changed)
+    if not changed:
+        print(f"📁 No outputs changed ({unchanged} checked).")
+        return changed
+    print(f"📁 {len(changed)} output(s) changed, {unchanged} unchanged:")
+    for path, result in sorted(changed.items()):
+        print(f"  {result:<9} {path}")
+    return changed
+
+def commit_changes(message):
+    """
+    Stage exactly the outputs that changed in this run and make one commit.
+    Does nothing (and makes no commit) if nothing changed. Returns True if
+    a commit was made.
+    """
+    changed = changed_outputs()
+    if not changed:
+        print("Nothing changed, no commit.")
+        return False
+    present = sorted(path for path, result in changed.items() if result != "removed")
+    removed = sorted(path for path, result in changed.items() if result == "removed")
+    if present:
+        subprocess.run(["git", "add", "--", *present], check=True)
+    if removed:
+        subprocess.run(["git", "rm", "--cached", "--quiet", "--ignore-unmatch", "--", *removed], check=True)
+    if subprocess.run(["git", "diff", "--staged", "--quiet"]).returncode == 0:
+        print("Changed outputs match what is already committed, no commit.")
+        return False
+    subprocess.run(["git", "commit", "--quiet", "-m", message], check=True)
+    print(f"Committed {len(changed)} changed output(s).")
+    return True
@@ -0,0 +1,122 @@
+"""
+Run the full clan sync in one process: process the latest upload, detect
+renames against the previous upload (output/latest_rsn_changes.json), match
+RSNs to Discord and carry matches over to renamed RSNs, and refresh the
+tenure rollups (see clan_sync.tenure). Each stage hands
+its in-memory result to the next instead of re-reading the file it wrote.
+If the latest upload's roster is the same as the last one processed, the
+whole pipeline is skipped.
+
+With --compact it also writes the compact exports (see clan_sync.compact).
+Stage timings and matching tier counters are written to
+output/pipeline_metrics.json; --trace-memory adds per-stage peak memory
+(several times slower) and --profile a cProfile capture.
+
+Outputs are only rewritten when their contents change (see
+clan_sync.outputs). With --commit the changed ones are committed in a single
+commit, and nothing is committed when nothing changed. With --store the
+SQLite store (see clan_sync.store) is synced in the same run and the roster
+and match JSON are regenerated from its views.
+
+Usage: python -m clan_sync [--full] [--force] [--compact] [--workers N] [--scorer exact|trigram] [--profile] [--trace-memory] [--store] [--commit]
+"""
+import argparse
+
+from clan_sync.compact import write_compact_exports
+from clan_sync.feed import process_and_publish
+from clan_sync.history import sync_history
+from clan_sync.identities import sync_identities
+from clan_sync.matching import SCORERS, inputs_fingerprint, run_matching
+from clan_sync.metrics import instrumented, stage
+from clan_sync.outputs import commit_changes, report_changes
+from clan_sync.renames import detect_latest_renames
+from clan_sync.store import export_views, sync_store
+from clan_sync.tenure import sync_tenure
+from clan_sync.updates import update_matched_members
+
+COMMIT_MESSAGE = "Full sync update"
+
+def run_history_stages(metrics=None):
+    """
+    Bring the history up to date and run what reads it: identities, rename
+    detection between the two newest uploads (output/latest_rsn_changes.json)
+    and the tenure rollups. Returns (history, identities, rsn_changes);
+    rsn_changes is None with fewer than two uploads.
+    """
+    with stage(metrics, "history"):
+        history = sync_history()
+        identities, _ = sync_identities(history)
+    with stage(metrics, "renames"):
+        rsn_changes = detect_latest_renames(history)
+    with stage(metrics, "tenure"):
+        sync_tenure(history, identities)
+    return history, identities, rsn_changes
+
+def run_pipeline(
+    full=False, workers=1, force=False, compact=False, scorer="exact", store=False, discord_members=None,
+    metrics=None, match=True
+):
+    """
+    Run every stage. With match=False (a clan without a Discord export)
+    only the roster, feed, history, renames and tenure are synced; matching
+    and the match updates are skipped and results["matched"] is None.
+    """
+    with stage(metrics, "process_upload"):
+        clan_data = process_and_publish(force=force, inputs_hash=inputs_fingerprint())
+    if clan_data is None:
+        return None
+    history, identities, rsn_changes = run_history_stages(metrics)
+    if not match:
+        if compact:
+            with stage(metrics, "compact"):
+                write_compact_exports(clan_data)
+        if store:
+            with stage(metrics, "store"):
+                sync_store(history, identities, matched={})
+        return {"matched": None}
+
+    with stage(metrics, "matching"):
+        results = run_matching(
+            clan_data=clan_data, discord_members=discord_members, full=full, workers=workers,
+            scorer=scorer, metrics=metrics, identities=identities
+        )
+    if compact:
+        with stage(metrics, "compact"):
+            write_compact_exports(clan_data, results["matched"])
+
+    with stage(metrics, "updates"):
+        if rsn_changes is None:
+            print("🟡 No RSN changes to process (fewer than two uploads).")
+        else:
+            update_matched_members(rsn_changes, matched_members=results["matched"])
+
+    if store:
+        with stage(metrics, "store"):
+            sync_store(history, identities, matched=results["matched"])
+            export_views()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the full clan sync pipeline.")
+    parser.add_argument("--full", action="store_true", help="ignore the match cache and rematch every member")
+    parser.add_argument("--force", action="store_true", help="run even if the roster has not changed")
+    parser.add_argument("--compact", action="store_true", help="also write the compact roster and match exports")
+    parser.add_argument("--workers", type=int, default=1, help="score members in N processes (0 = one per CPU core)")
+    parser.add_argument("--scorer", choices=SCORERS, default="exact", help="fuzzy priority scorer (trigram: batched top-k, approximate)")
+    parser.add_argument("--profile", action="store_true", help="also capture a cProfile of the run (output/pipeline_profile.pstats)")
+    parser.add_argument("--trace-memory", action="store_true", help="also record per-stage peak memory (tracemalloc, several times slower)")
+    parser.add_argument("--store", action="store_true", help="also sync the SQLite store and regenerate the roster and match JSON from it")
+    parser.add_argument("--commit", action="store_true", help="commit the changed outputs (one commit, none if nothing changed)")
+    args = parser.parse_args()
+    with instrumented("python -m clan_sync", profile=args.profile, trace_memory=args.trace_memory) as metrics:
+        run_pipeline(
+            full=args.full, workers=args.workers, force=args.force, compact=args.compact,
+            scorer=args.scorer, store=args.store, metrics=metrics
+        )
+        report_changes()
+        if args.commit:
+            with metrics.stage("git"):
+                commit_changes(COMMIT_MESSAGE)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Turn the latest Clanmate Export upload into clan_ranks_for_bot.json.
+"""
+import json
+import os
+from datetime import timedelta
+
+from clan_sync.ingest import canonical_hash, iter_clanmates, sorted_members, write_roster_json
+from clan_sync.outputs import write_json
+from clan_sync.roster import Member, Roster, parse_joined_date
+from clan_sync.uploads import latest_uploads
+
+UPLOADS_DIR = "uploads"
+CLAN_RANKS_FILE = "clan_ranks_for_bot.json"
+# Roster hash of every processed upload, and of the last one processed
+PROCESSED_UPLOADS_FILE = os.path.join("output", "processed_uploads.json")
+
+def find_latest_upload(uploads_dir=UPLOADS_DIR):
+    """
+    Return the most recently captured upload in the uploads directory, or
+    None. The manifest is not saved here: a duplicate upload must leave
+    nothing to commit, and the history stage saves it on a real sync.
+    """
+    latest = latest_uploads(1, uploads_dir, save=False)
+    return latest[0] if latest else None
+
+def adjacent_joined_dates(joined_date):
+    """
+    The joinedDate and the days either side of it. Uploads from admins in
+    different timezones can disagree on a member's joinedDate by one day.
+    """
+    day = parse_joined_date(joined_date)
+    if day is None:
+        return [joined_date]
+    return [joined_date] + [
+        f"{d.day}-{d.strftime('%b')}-{d.year}" for d in (day - timedelta(days=1), day + timedelta(days=1))
+    ]
+
+def roster_rows(roster):
+    """(rsn, rank, joinedDate) rows of a Roster or clan_ranks dict, sorted by RSN."""
+    if isinstance(roster, Roster):
+        rows = ((m.rsn, m.rank, m.joined_date) for m in roster)
+    else:
+        rows = ((rsn, info["rank"], info["joinedDate"]) for rsn, info in roster.items())
+    return sorted(rows, key=lambda row: row[0])
+
+def roster_hash(roster):
+    """Content hash of a roster, independent of upload order and formatting."""
+    return canonical_hash(roster_rows(roster))
+
+def load_processed_uploads(processed_file=PROCESSED_UPLOADS_FILE):
+    if not os.path.isfile(processed_file):
+        return {"last_roster_hash": None, "uploads": {}}
+    with open(processed_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_processed_uploads(processed, processed_file=PROCESSED_UPLOADS_FILE):
+    write_json(processed_file, processed, indent=2)
+
+def write_clan_ranks(roster, output_file=CLAN_RANKS_FILE):
+    """Write a Roster or clan_ranks dict, streamed out without building the JSON in memory."""
+    write_roster_json(roster_rows(roster), output_file)
+
+def _collect(rows, members):
+    """Pass sorted rows through, keeping a Member for each."""
+    for rsn, rank, joined_date in rows:
+        members.append(Member(rsn, rank, joined_date))
+        yield rsn, rank, joined_date
+
+def process_latest_upload(uploads_dir=UPLOADS_DIR, output_file=CLAN_RANKS_FILE, force=False, inputs_hash=None):
+    """
+    process_clan_ranks(), returning (Roster, roster hash). The upload is
+    streamed through the bounded-memory sort straight into output_file, and
+    the hash comes out of the same pass.
+
+    inputs_hash fingerprints the other inputs of a sync (see
+    matching.inputs_fingerprint); when given, an unchanged roster is only
+    skipped if the fingerprint is also the one last processed.
+    """
+    # Ensure uploads directory exists
+    os.makedirs(uploads_dir, exist_ok=True)
+
+    latest_file = find_latest_upload(uploads_dir)
+    if not latest_file:
+        print("No clan rank files found in the uploads directory.")
+        return None
+
+    print(f"Processing latest file: {latest_file}")
+
+    try:
+        processed = load_processed_uploads()
+        members = []
+        # An unchanged roster leaves output_file alone, so a repeated upload leaves nothing to commit
+        count, content_hash = write_roster_json(
+            _collect(sorted_members(iter_clanmates(latest_file)), members),
+            output_file,
+            keep=lambda count, content_hash: force or content_hash != processed["last_roster_hash"]
+        )
+        inputs_unchanged = inputs_hash is None or inputs_hash == processed.get("last_inputs_hash")
+        if content_hash == processed["last_roster_hash"] and inputs_unchanged and not force:
+            print("Roster unchanged since the last processed upload. Nothing to do.")
+            return None
+        if content_hash == processed["last_roster_hash"] and not inputs_unchanged:
+            print("Roster unchanged, but the Discord export or manual matches changed.")
+
+        processed["uploads"][os.path.basename(latest_file)] = content_hash
+        processed["last_roster_hash"] = content_hash
+        if inputs_hash is not None:
+            processed["last_inputs_hash"] = inputs_hash
+        save_processed_uploads(processed)
+
+        print(f"Successfully processed {count} clan members.")
+        print(f"Output saved to {output_file}")
+        return Roster(members), content_hash
+
+    except Exception as e:
+        print(f"Error processing file {latest_file}: {str(e)}")
+        return None
+
+def process_clan_ranks(uploads_dir=UPLOADS_DIR, output_file=CLAN_RANKS_FILE, force=False):
+    """
+    Find the latest clan rank file in the uploads directory and process it.
+    Generate a simplified JSON file for the Discord bot that includes rank and joinedDate.
+    Returns the Roster, or None if there was nothing to process or the
+    roster is identical to the last one processed (unless force is set).
+    """
+    processed = process_latest_upload(uploads_dir, output_file, force)
+    return processed[0] if processed else None
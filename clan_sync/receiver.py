@@ -0,0 +1,367 @@
+"""
+Local stand-in for the /clanrank upload endpoint, with burst coalescing.
+
+POST /clanrank takes a Clanmate Export payload, validates it, saves it as
+uploads/clanrank_YYYYMMDD_HHMMSS.json and registers it in the manifest.
+Uploads are debounced: the pipeline runs once, on the newest roster, after
+--window seconds without a new upload (or --max-delay seconds after the
+first upload of a burst, whichever comes first). An upload whose roster is
+the same as the last one accepted is acknowledged but not saved. Uploads
+arriving during a run schedule one more run after it. GET /health reports
+counters and the last run. Parsing, hashing and saving an upload run in a
+worker thread, so a large upload does not hold up other connections; saves
+(and the manifest updates that come with them) are serialized by a lock.
+
+The built-in load generator posts synthetic rosters and reports throughput
+and latency percentiles. Point a scratch server at a copy of the repo (or
+use --command true) when load testing, since every accepted upload is a
+real file in uploads/.
+
+Usage:
+    python -m clan_sync.receiver serve [--port 8080] [--window 30] [--command "python -m clan_sync.shards --compact --commit"]
+    python -m clan_sync.receiver load [--url http://127.0.0.1:8080/clanrank] [--requests 200] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from clan_sync.bench import make_roster
+from clan_sync.ingest import REQUIRED_FIELDS
+from clan_sync.outputs import atomic_output
+from clan_sync.ranks import roster_hash
+from clan_sync.roster import Roster
+from clan_sync.uploads import UPLOADS_DIR, latest_uploads, register_upload
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEBOUNCE_WINDOW = 30.0
+MAX_DELAY = 300.0
+MAX_BODY = 32 * 1024 * 1024
+DEFAULT_COMMAND = f"{shlex.quote(sys.executable)} -m clan_sync.shards --compact --commit"
+
+STATUS_TEXT = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"
+}
+
+class UploadRejected(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def validate_payload(body):
+    """Parse and check a Clanmate Export payload. Returns (payload, Roster)."""
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise UploadRejected(400, f"invalid JSON: {e}")
+    if not isinstance(payload, dict) or not isinstance(payload.get("clanMemberMaps"), list):
+        raise UploadRejected(400, "expected an object with a clanMemberMaps list")
+    entries = payload["clanMemberMaps"]
+    if not entries:
+        raise UploadRejected(400, "clanMemberMaps is empty")
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise UploadRejected(400, f"clanMemberMaps[{i}] is not an object")
+        missing = [field for field in REQUIRED_FIELDS if not isinstance(entry.get(field), str)]
+        if missing:
+            raise UploadRejected(400, f"clanMemberMaps[{i}] is missing {', '.join(missing)}")
+    return payload, Roster.from_clanmates(entries)
+
+def _parse_upload(body):
+    payload, roster = validate_payload(body)
+    return payload, roster, roster_hash(roster)
+
+def _save_upload(path, payload):
+    with atomic_output(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    register_upload(path)
+
+class UploadReceiver:
+    """Saves uploads and coalesces bursts of them into single pipeline runs."""
+
+    def __init__(self, command, window=DEBOUNCE_WINDOW, max_delay=MAX_DELAY, uploads_dir=UPLOADS_DIR):
+        self.command = command
+        self.window = window
+        self.max_delay = max_delay
+        self.uploads_dir = uploads_dir
+        self.stats = {"accepted": 0, "duplicates": 0, "rejected": 0, "runs": 0, "failed_runs": 0}
+        self.last_run = None
+        self._last_hash = None
+        self._burst_started = None
+        self._timer = None
+        self._running = None
+        self._rerun = False
+        # One save at a time: the duplicate check, the file name and the manifest depend on the previous save
+        self._save_lock = asyncio.Lock()
+
+        latest = latest_uploads(1, uploads_dir)
+        if latest:
+            self._last_hash = roster_hash(Roster.load_upload(latest[0]))
+
+    def _upload_path(self):
+        """A free clanrank_YYYYMMDD_HHMMSS.json name for now (later seconds if taken)."""
+        now = datetime.now().replace(microsecond=0)
+        while True:
+            path = os.path.join(self.uploads_dir, f"clanrank_{now.strftime('%Y%m%d_%H%M%S')}.json")
+            if not os.path.exists(path):
+                return path
+            now += timedelta(seconds=1)
+
+    async def accept(self, body):
+        """Validate and save one upload. Returns (status, response)."""
+        try:
+            payload, roster, content_hash = await asyncio.to_thread(_parse_upload, body)
+        except UploadRejected:
+            self.stats["rejected"] += 1
+            raise
+
+        async with self._save_lock:
+            if content_hash == self._last_hash:
+                self.stats["duplicates"] += 1
+                return 200, {"status": "duplicate", "members": len(roster)}
+            path = self._upload_path()
+            await asyncio.to_thread(_save_upload, path, payload)
+            self._last_hash = content_hash
+        self.stats["accepted"] += 1
+        delay = self._schedule()
+        return 202, {"status": "accepted", "file": os.path.basename(path), "members": len(roster), "run_in": round(delay, 3)}
+
+    def _schedule(self):
+        """(Re)start the debounce timer; returns seconds until the run."""
+        loop = asyncio.get_running_loop()
+        if self._running is not None:
+            # Picked up by one more run when the current one finishes
+            self._rerun = True
+            return self.window
+        now = loop.time()
+        if self._burst_started is None:
+            self._burst_started = now
+        delay = min(self.window, max(0.0, self._burst_started + self.max_delay - now))
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, self._start_run)
+        return delay
+
+    def _start_run(self):
+        self._timer = None
+        self._burst_started = None
+        self._running = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        started = time.perf_counter()
+        print(f"🚀 Running: {self.command}")
+        try:
+            process = await asyncio.create_subprocess_exec(*shlex.split(self.command))
+            returncode = await process.wait()
+        except OSError as e:
+            print(f"Pipeline failed to start: {e}")
+            returncode = None
+        seconds = time.perf_counter() - started
+        self.stats["runs"] += 1
+        if returncode != 0:
+            self.stats["failed_runs"] += 1
+        self.last_run = {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            "returncode": returncode
+        }
+        print(f"Pipeline finished in {seconds:.1f}s (exit {returncode})")
+        self._running = None
+        if self._rerun:
+            self._rerun = False
+            self._schedule()
+
+    def health(self):
+        return {
+            **self.stats,
+            "pending": self._timer is not None or self._rerun,
+            "running": self._running is not None,
+            "last_run": self.last_run,
+            "window": self.window,
+            "max_delay": self.max_delay
+        }
+
+# === Minimal HTTP/1.1 ===
+async def read_request(reader):
+    """Returns (method, path, headers, body), or None if the client sent nothing."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise UploadRejected(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if method == "POST":
+        if "content-length" not in headers:
+            raise UploadRejected(411, "Content-Length required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise UploadRejected(400, "invalid Content-Length")
+        if length > MAX_BODY:
+            raise UploadRejected(413, f"payload larger than {MAX_BODY} bytes")
+        body = await reader.readexactly(length)
+    return method, urlsplit(target).path, headers, body
+
+def write_response(writer, status, data):
+    body = json.dumps(data).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+        + body
+    )
+
+async def handle_connection(receiver, reader, writer):
+    try:
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, _, body = request
+            if path == "/clanrank":
+                if method != "POST":
+                    raise UploadRejected(405, "use POST")
+                status, response = await receiver.accept(body)
+            elif path == "/health":
+                status, response = 200, receiver.health()
+            else:
+                raise UploadRejected(404, f"no route for {path}")
+        except UploadRejected as e:
+            status, response = e.status, {"status": "rejected", "error": str(e)}
+        except asyncio.IncompleteReadError:
+            return
+        except Exception as e:
+            status, response = 500, {"status": "error", "error": str(e)}
+        write_response(writer, status, response)
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, **receiver_kwargs):
+    receiver = UploadReceiver(**receiver_kwargs)
+    server = await asyncio.start_server(lambda r, w: handle_connection(receiver, r, w), host, port)
+    print(f"📥 Listening on http://{host}:{port}/clanrank (window {receiver.window}s, max delay {receiver.max_delay}s)")
+    async with server:
+        await server.serve_forever()
+
+# === Load generator ===
+def synthetic_payload(rng, size):
+    """A Clanmate Export payload with a fresh random roster."""
+    roster = make_roster(rng, size, set(), datetime.now().date())
+    return {
+        "clanName": "Load Test",
+        "clanMemberMaps": [{"rsn": rsn, "rank": rank, "joinedDate": jd} for rsn, (rank, jd) in roster.items()]
+    }
+
+async def post(url, body):
+    """POST body to url; returns (status, seconds)."""
+    parts = urlsplit(url)
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        writer.write(
+            f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), time.perf_counter() - started
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+async def generate_load(url, requests=200, concurrency=20, size=500, duplicate_rate=0.5, seed=0):
+    """
+    Post `requests` uploads with `concurrency` in flight; about duplicate_rate
+    of them repeat the previous roster, like admins exporting the same clan.
+    Returns a summary with throughput and latency percentiles.
+    """
+    rng = random.Random(seed)
+    distinct = max(1, round(requests * (1 - duplicate_rate)))
+    bodies = [json.dumps(synthetic_payload(rng, size)).encode("utf-8") for _ in range(min(distinct, 20))]
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(bodies[i * len(bodies) // requests])
+
+    latencies = []
+    statuses = {}
+
+    async def worker():
+        while not queue.empty():
+            body = queue.get_nowait()
+            try:
+                status, seconds = await post(url, body)
+            except OSError:
+                status, seconds = "connection_error", None
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if seconds is not None:
+                latencies.append(seconds)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "members_per_upload": size,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 2) if latencies else None
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        "statuses": statuses
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive Clanmate Export uploads and coalesce bursts into one pipeline run.")
+    commands = parser.add_subparsers(dest="mode", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the upload receiver")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--window", type=float, default=DEBOUNCE_WINDOW, help="seconds of quiet before a run")
+    serve_parser.add_argument("--max-delay", type=float, default=MAX_DELAY, help="longest a burst can postpone a run")
+    serve_parser.add_argument("--command", default=DEFAULT_COMMAND, help="pipeline command to run")
+
+    load_parser = commands.add_parser("load", help="post synthetic uploads to a receiver")
+    load_parser.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}/clanrank")
+    load_parser.add_argument("--requests", type=int, default=200)
+    load_parser.add_argument("--concurrency", type=int, default=20)
+    load_parser.add_argument("--size", type=int, default=500, help="members per synthetic upload")
+    load_parser.add_argument("--duplicate-rate", type=float, default=0.5)
+    load_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, command=args.command, window=args.window, max_delay=args.max_delay))
+        except KeyboardInterrupt:
+            pass
+    else:
+        summary = asyncio.run(generate_load(args.url, args.requests, args.concurrency, args.size, args.duplicate_rate, args.seed))
+        print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Detect RSN changes between clan rank uploads.
+"""
+import json
+import os
+from difflib import SequenceMatcher
+
+from clan_sync.history import sync_history
+from clan_sync.outputs import write_json
+from clan_sync.roster import Roster, normalize
+
+OUTPUT_DIR = "output"
+OUTPUT_FILE = os.path.join(OUTPUT_DIR, "latest_rsn_changes.json")
+
+# Same-joinedDate buckets with several leavers/joiners are paired by cost:
+# RANK_WEIGHT of it for a rank change, the rest for name dissimilarity.
+RANK_WEIGHT = 0.5
+MAX_RENAME_COST = 0.5
+MAX_BUCKET_SIZE = 8
+
+def load_clan_members(filepath):
+    return Roster.load_upload(filepath)
+
+def rename_cost(old_rsn, new_rsn, old_rank=None, new_rank=None):
+    """
+    Cost in [0, 1] of pairing a leaver with a joiner: half for a rank change,
+    half for how different the normalized names are.
+    """
+    rank_cost = 0.0 if old_rank == new_rank else 1.0
+    name_cost = 1.0 - SequenceMatcher(None, normalize(old_rsn), normalize(new_rsn)).ratio()
+    return RANK_WEIGHT * rank_cost + (1.0 - RANK_WEIGHT) * name_cost
+
+def min_cost_assignment(costs):
+    """
+    Hungarian algorithm on a square cost matrix.
+    Returns assignment[row] = column minimizing the total cost.
+    """
+    n = len(costs)
+    INF = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (n + 1)
+    p = [0] * (n + 1)
+    way = [0] * (n + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = INF
+            j1 = 0
+            for j in range(1, n + 1):
+                if not used[j]:
+                    cur = costs[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(n + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    assignment = [0] * n
+    for j in range(1, n + 1):
+        assignment[p[j] - 1] = j - 1
+    return assignment
+
+def resolve_bucket(left_rsns, joined_rsns, ranks=None, jd=None, max_cost=MAX_RENAME_COST):
+    """
+    Optimal one-to-one pairing of leavers and joiners sharing a joinedDate.
+    Pairs costing more than max_cost are left unpaired.
+    Returns [(old_rsn, new_rsn, cost)].
+    """
+    ranks = ranks or {}
+    size = max(len(left_rsns), len(joined_rsns))
+    # Leaving someone unpaired costs max_cost; pairs over it are never worth taking
+    costs = [[max_cost] * size for _ in range(size)]
+    for i, old_rsn in enumerate(left_rsns):
+        for j, new_rsn in enumerate(joined_rsns):
+            cost = rename_cost(old_rsn, new_rsn, ranks.get((old_rsn, jd)), ranks.get((new_rsn, jd)))
+            costs[i][j] = cost if cost <= max_cost else max_cost + 1.0
+    pairs = []
+    for i, j in enumerate(min_cost_assignment(costs)):
+        if i < len(left_rsns) and j < len(joined_rsns) and costs[i][j] <= max_cost:
+            pairs.append((left_rsns[i], joined_rsns[j], costs[i][j]))
+    return pairs
+
+def pair_renames(joined, left, ranks=None, max_cost=MAX_RENAME_COST, max_bucket_size=MAX_BUCKET_SIZE):
+    """
+    Pair (rsn, joinedDate) members who joined with those who left on the
+    same joinedDate. A date with exactly one leaver and one joiner is always
+    a rename; busier dates are resolved by min_cost_assignment() on name
+    similarity and rank continuity (ranks maps (rsn, joinedDate) -> rank).
+    Dates with more than max_bucket_size leavers or joiners are skipped.
+    """
+    # Index by joinedDate
+    joined_by_date = {}
+    for rsn, jd in joined:
+        joined_by_date.setdefault(jd, []).append(rsn)
+
+    left_by_date = {}
+    for rsn, jd in left:
+        left_by_date.setdefault(jd, []).append(rsn)
+
+    renamed = []
+    for jd in joined_by_date.keys() & left_by_date.keys():
+        new_rsns = sorted(joined_by_date[jd])
+        old_rsns = sorted(left_by_date[jd])
+        if len(new_rsns) == 1 and len(old_rsns) == 1:
+            renamed.append({
+                "joinedDate": jd,
+                "old_rsn": old_rsns[0],
+                "new_rsn": new_rsns[0],
+                "confidence": 1.0
+            })
+        elif max(len(new_rsns), len(old_rsns)) <= max_bucket_size:
+            for old_rsn, new_rsn, cost in resolve_bucket(old_rsns, new_rsns, ranks, jd, max_cost):
+                renamed.append({
+                    "joinedDate": jd,
+                    "old_rsn": old_rsn,
+                    "new_rsn": new_rsn,
+                    "confidence": round(1.0 - cost, 3)
+                })
+
+    return renamed
+
+def find_renames(new_roster, old_roster):
+    """Likely renames between two Rosters (or clanMemberMaps lists)."""
+    if not isinstance(new_roster, Roster):
+        new_roster = Roster.from_clanmates(new_roster)
+    if not isinstance(old_roster, Roster):
+        old_roster = Roster.from_clanmates(old_roster)
+    # An RSN on both rosters was not renamed, even if its joinedDate shifted
+    joined = {(m.rsn, m.joined_date) for m in new_roster if m.rsn not in old_roster}
+    left = {(m.rsn, m.joined_date) for m in old_roster if m.rsn not in new_roster}
+    ranks = {(m.rsn, m.joined_date): m.rank for m in [*old_roster, *new_roster]}
+    return pair_renames(joined, left, ranks)
+
+def renames_from_diff(diff):
+    """Likely renames from a roster history diff (see clan_sync.history.diff_rosters)."""
+    joined = {(rsn, info["joinedDate"]) for rsn, info in diff["joined"].items()}
+    left = {(rsn, info["joinedDate"]) for rsn, info in diff["left"].items()}
+    ranks = {(rsn, info["joinedDate"]): info["rank"] for rsn, info in [*diff["joined"].items(), *diff["left"].items()]}
+    return pair_renames(joined, left, ranks)
+
+def compare_clan_files(newest_file, older_file):
+    return find_renames(load_clan_members(newest_file), load_clan_members(older_file))
+
+def load_rsn_changes(renames_file=OUTPUT_FILE):
+    """Return the saved RSN changes, or None if the file is missing, empty or invalid."""
+    if not os.path.isfile(renames_file) or os.path.getsize(renames_file) == 0:
+        return None
+    try:
+        with open(renames_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+def detect_latest_renames(history=None):
+    """Compare the two newest uploads and save the likely RSN changes."""
+    if history is None:
+        history = sync_history()
+    if len(history) < 2:
+        print("Need at least two clanrank JSON files to compare.")
+        return None
+
+    newest_file, second_newest_file = history.uploads()[-1], history.uploads()[-2]
+
+    # Read the change straight from the history deltas instead of loading both uploads
+    renamed = renames_from_diff(history.diff(-2, -1))
+
+    # Write JSON output (creates the output folder if needed)
+    write_json(OUTPUT_FILE, renamed, indent=2)
+
+    print(f"Comparing:\n  Newest: {newest_file}\n  Older: {second_newest_file}")
+    print(f"\n🔁 Detected {len(renamed)} likely RSN changes (saved to {OUTPUT_FILE}):")
+
+    for entry in renamed:
+        print(f"  {entry['old_rsn']} → {entry['new_rsn']} (joined {entry['joinedDate']}, confidence {entry['confidence']})")
+    return renamed
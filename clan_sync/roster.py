@@ -0,0 +1,123 @@
+"""
+Shared in-memory roster model.
+
+Every stage loads rosters through Roster so each member is parsed once:
+rank and joinedDate strings are interned (a roster has a dozen ranks and a
+few hundred distinct dates), joinedDate is parsed into an ordinal day, and
+the normalized RSN used for matching is computed up front.
+"""
+import json
+import re
+import sys
+from datetime import date, datetime
+from functools import lru_cache
+
+from clan_sync.ingest import iter_clanmates
+
+def normalize(name):
+    return re.sub(r'[^a-z0-9]', '', name.lower()) if name else ""
+
+def parse_joined_date(joined_date):
+    """Parse a Clanmate Export joinedDate like "14-Sep-2024", or None if malformed."""
+    try:
+        return datetime.strptime(joined_date, "%d-%b-%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+@lru_cache(maxsize=None)
+def joined_day(joined_date):
+    """joinedDate as a proleptic ordinal day, or 0 if it cannot be parsed."""
+    day = parse_joined_date(joined_date)
+    return day.toordinal() if day else 0
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Member:
+    __slots__ = ("rsn", "rank", "joined_date", "joined_day", "norm_rsn")
+
+    def __init__(self, rsn, rank, joined_date):
+        self.rsn = rsn
+        self.rank = _intern(rank)
+        self.joined_date = _intern(joined_date)
+        self.joined_day = joined_day(joined_date) if isinstance(joined_date, str) else 0
+        self.norm_rsn = normalize(rsn)
+
+    def joined(self):
+        """joinedDate as a date, or None."""
+        return date.fromordinal(self.joined_day) if self.joined_day else None
+
+    def to_dict(self):
+        return {"rank": self.rank, "joinedDate": self.joined_date}
+
+class Roster:
+    """Members keyed by RSN, in insertion order (sorted by RSN once loaded)."""
+
+    __slots__ = ("members",)
+
+    def __init__(self, members=()):
+        self.members = {}
+        for member in members:
+            self.members[member.rsn] = member
+
+    @classmethod
+    def from_clanmates(cls, entries):
+        """
+        Build from Clanmate Export clanMemberMaps entries, sorted by RSN.
+        Entries missing any of the required fields are skipped.
+        """
+        return cls(sorted(
+            (
+                Member(entry["rsn"], entry["rank"], entry["joinedDate"])
+                for entry in entries
+                if all(k in entry for k in ("rsn", "rank", "joinedDate"))
+            ),
+            key=lambda member: member.rsn
+        ))
+
+    @classmethod
+    def from_dict(cls, clan_dict):
+        """Build from the clan_ranks_for_bot.json form, keeping its order."""
+        return cls(Member(rsn, info.get("rank"), info.get("joinedDate")) for rsn, info in clan_dict.items())
+
+    @classmethod
+    def load_upload(cls, path):
+        """Load a Clanmate Export upload, reading its entries incrementally."""
+        return cls.from_clanmates(iter_clanmates(path))
+
+    @classmethod
+    def load(cls, path):
+        """Load a clan_ranks_for_bot.json style file."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members.values())
+
+    def __contains__(self, rsn):
+        return rsn in self.members
+
+    def get(self, rsn):
+        return self.members.get(rsn)
+
+    def rsns(self):
+        return list(self.members)
+
+    def rank(self, rsn):
+        member = self.members.get(rsn)
+        return member.rank if member else None
+
+    def joined_date(self, rsn):
+        member = self.members.get(rsn)
+        return member.joined_date if member else None
+
+    def to_dict(self):
+        """The clan_ranks_for_bot.json form: RSN -> {"rank", "joinedDate"}."""
+        return {rsn: member.to_dict() for rsn, member in self.members.items()}
+
+def as_roster(data):
+    """Accept a Roster or a clan_ranks_for_bot.json style dict."""
+    return data if isinstance(data, Roster) else Roster.from_dict(data)
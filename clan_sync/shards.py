@@ -0,0 +1,215 @@
+"""
+Run several clans through one deployment, one shard per clanName.
+
+Uploads still arrive in uploads/. The primary clan (the one this repo was
+set up for) keeps the top-level layout, so clan_ranks_for_bot.json and
+everything the bot already reads stay where they are. Uploads whose
+clanName is another clan are moved to that clan's shard:
+
+  clans/<slug>/uploads/                   the clan's uploads
+  clans/<slug>/clan_ranks_for_bot.json    its roster, feed/, output/ ...
+  clans/<slug>/data/                      the clan's own discord_members.csv and
+                                          manual_matches.json; without an export
+                                          the shard is not matched to Discord
+  clans/index.json                        every clan with its files and latest upload
+
+Each shard picks its own latest upload and runs the full pipeline
+(clan_sync.pipeline) inside its directory, so roster output, identities and
+renames, Discord matching and the feed are all per clan. Shards are
+independent and run in parallel worker processes (--shards N).
+
+Each shard collects its own pipeline metrics in its worker; they are merged
+into output/pipeline_metrics.json (stage times and tier counters summed over
+the shards, plus one "shard <dir>" stage per shard). With --profile every
+worker captures a cProfile and the captures are merged into
+output/pipeline_profile.pstats.
+
+The primary clan is the one recorded in clans/index.json, or on the first
+run the clanName of the earliest upload (uploads without a clanName always
+stay with it).
+
+Usage: python -m clan_sync.shards [--shards N] [--full] [--force] [--compact] [--workers N] [--scorer exact|trigram] [--profile] [--trace-memory] [--commit]
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from clan_sync.matching import DISCORD_FILE, SCORERS
+from clan_sync.metrics import PipelineMetrics, instrumented
+from clan_sync.outputs import (
+    atomic_output, commit_changes, record_outputs, recorded_outputs, remove_output, report_changes, reset_outputs, write_json
+)
+from clan_sync.pipeline import COMMIT_MESSAGE, run_pipeline
+from clan_sync.ranks import CLAN_RANKS_FILE
+from clan_sync.uploads import CLAN_INDEX_FILE, UPLOADS_DIR, load_index, load_manifest, primary_clan, sync_manifest
+
+CLANS_DIR = "clans"
+
+def clan_slug(clan):
+    """Directory name for a clanName: lowercase, runs of anything else turned into "-"."""
+    return re.sub(r"[^a-z0-9]+", "-", clan.lower()).strip("-") or "clan"
+
+def shard_dir(clan, primary):
+    return "." if clan is None or clan == primary else os.path.join(CLANS_DIR, clan_slug(clan))
+
+def partition_uploads(primary=None, uploads_dir=UPLOADS_DIR):
+    """
+    Move uploads of clans other than the primary one into their shard.
+    Returns (primary clan, {shard directory: clanName}) for every shard,
+    the primary one (".") first.
+    """
+    manifest = sync_manifest(uploads_dir)
+    primary = primary or primary_clan(manifest, load_index())
+    moved = 0
+    for entry in manifest["uploads"]:
+        directory = shard_dir(entry.get("clan"), primary)
+        if directory == ".":
+            continue
+        source = os.path.join(uploads_dir, entry["file"])
+        with atomic_output(os.path.join(directory, UPLOADS_DIR, entry["file"]), "wb") as f, open(source, "rb") as src:
+            shutil.copyfileobj(src, f)
+        remove_output(source)
+        moved += 1
+    if moved:
+        sync_manifest(uploads_dir)
+        print(f"📦 Moved {moved} upload(s) to their clan shards")
+
+    shards = {".": primary}
+    if os.path.isdir(CLANS_DIR):
+        for name in sorted(os.listdir(CLANS_DIR)):
+            directory = os.path.join(CLANS_DIR, name)
+            if os.path.isdir(os.path.join(directory, UPLOADS_DIR)):
+                shards[directory] = None
+    return primary, shards
+
+def run_shard(root, directory, options, profile=False, trace_memory=False):
+    """
+    Run the pipeline for one shard (in a worker process). Returns a summary
+    with the shard's outputs, relative to root, and its metrics (and the
+    path of its cProfile capture with profile=True).
+    """
+    start = time.perf_counter()
+    metrics = PipelineMetrics(f"shard {directory}", trace_memory=trace_memory, profile=profile)
+    os.chdir(os.path.join(root, directory))
+    reset_outputs()
+    metrics.start()
+    try:
+        # Another guild's export would only produce false matches
+        match = directory == "." or os.path.isfile(DISCORD_FILE)
+        if not match:
+            print(f"🟡 No {DISCORD_FILE} in {directory}, skipping Discord matching")
+        results = run_pipeline(metrics=metrics, match=match, **options)
+        manifest = load_manifest()
+    finally:
+        metrics.stop()
+        os.chdir(root)
+    profile_file = None
+    if profile:
+        fd, profile_file = tempfile.mkstemp(suffix=".pstats")
+        os.close(fd)
+        metrics.dump_profile(profile_file)
+    latest = manifest["uploads"][-1] if manifest and manifest["uploads"] else None
+    return {
+        "dir": directory,
+        "clan": latest["clan"] if latest else None,
+        "latest_upload": latest["file"] if latest else None,
+        "members": latest["members"] if latest else None,
+        "synced": results is not None,
+        "matched": len(results["matched"]) if results and results["matched"] is not None else None,
+        "seconds": time.perf_counter() - start,
+        "peak_bytes": metrics.peak_bytes,
+        "metrics": {"stages": metrics.stages, "tiers": metrics.tiers, "counters": metrics.counters},
+        "profile_file": profile_file,
+        "outputs": {
+            os.path.normpath(os.path.join(directory, path)): result
+            for path, result in recorded_outputs().items()
+        }
+    }
+
+def index_entry(summary):
+    directory = summary["dir"]
+    matched = os.path.normpath(os.path.join(directory, "output", "matched_members.json"))
+    return {
+        "slug": clan_slug(summary["clan"]) if summary["clan"] else None,
+        "dir": directory,
+        "roster": os.path.normpath(os.path.join(directory, CLAN_RANKS_FILE)),
+        "feed": os.path.normpath(os.path.join(directory, "feed", "head.json")),
+        "matched": matched if os.path.isfile(matched) else None,
+        "latest_upload": summary["latest_upload"],
+        "members": summary["members"]
+    }
+
+def run_shards(shards=0, metrics=None, profile=False, trace_memory=False, **options):
+    """
+    Partition the uploads and run every shard, up to `shards` at a time
+    (0 = one process per CPU core). Writes clans/index.json, merges the
+    shards' metrics into metrics and returns the shard summaries.
+    """
+    primary, directories = partition_uploads()
+    root = os.getcwd()
+    processes = min(len(directories), shards or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_shard, root, directory, options, profile, trace_memory) for directory in directories]
+        summaries = [future.result() for future in futures]
+
+    for summary in summaries:
+        record_outputs(summary["outputs"])
+        if metrics is not None:
+            metrics.add_stage(f"shard {summary['dir']}", summary["seconds"], summary["peak_bytes"])
+            metrics.merge(summary["metrics"])
+        if summary["profile_file"]:
+            if metrics is not None:
+                metrics.add_profile(summary["profile_file"])
+            os.remove(summary["profile_file"])
+    if metrics is not None:
+        metrics.count("shards", len(summaries))
+        metrics.count("shards_synced", sum(summary["synced"] for summary in summaries))
+
+    clans = {}
+    for summary in summaries:
+        clan = summary["clan"] or (primary if summary["dir"] == "." else None)
+        if clan is None:
+            print(f"🟡 No uploads in {summary['dir']}, left out of the index")
+            continue
+        clans[clan] = index_entry({**summary, "clan": clan})
+    write_json(CLAN_INDEX_FILE, {"primary": primary, "clans": dict(sorted(clans.items()))}, indent=2)
+
+    for summary in summaries:
+        if not summary["synced"]:
+            status = "unchanged"
+        elif summary["matched"] is None:
+            status = "not matched (no Discord export)"
+        else:
+            status = f"{summary['matched']} matched"
+        print(f"  {summary['dir']:<24} {summary['clan'] or '-':<20} {status} ({summary['seconds']:.2f}s)")
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the clan sync for every clan, one shard per clanName.")
+    parser.add_argument("--shards", type=int, default=0, help="run up to N shards at once (0 = one per CPU core)")
+    parser.add_argument("--full", action="store_true", help="ignore the match caches and rematch every member")
+    parser.add_argument("--force", action="store_true", help="run even if a roster has not changed")
+    parser.add_argument("--compact", action="store_true", help="also write the compact roster and match exports")
+    parser.add_argument("--workers", type=int, default=1, help="score each shard's members in N processes")
+    parser.add_argument("--scorer", choices=SCORERS, default="exact", help="fuzzy priority scorer (trigram: batched top-k, approximate)")
+    parser.add_argument("--profile", action="store_true", help="also capture a cProfile of every shard (merged into output/pipeline_profile.pstats)")
+    parser.add_argument("--trace-memory", action="store_true", help="also record per-stage peak memory (tracemalloc, several times slower)")
+    parser.add_argument("--commit", action="store_true", help="commit the changed outputs of every shard (one commit, none if nothing changed)")
+    args = parser.parse_args()
+    with instrumented("python -m clan_sync.shards", profile=args.profile, trace_memory=args.trace_memory) as metrics:
+        run_shards(
+            shards=args.shards, metrics=metrics, profile=args.profile, trace_memory=args.trace_memory,
+            full=args.full, force=args.force,
+            compact=args.compact, workers=args.workers, scorer=args.scorer
+        )
+        report_changes()
+        if args.commit:
+            with metrics.stage("git"):
+                commit_changes(COMMIT_MESSAGE)
+
+if __name__ == "__main__":
+    main()
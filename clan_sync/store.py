@@ -0,0 +1,340 @@
+"""
+Optional SQLite store for rosters, matches and rename history.
+
+output/clan_sync.sqlite3 holds every roster snapshot from the history, the
+current Discord matches, the manual overrides and the renames found by the
+identity scan, indexed by rsn, normalized rsn, discord_id and joinedDate, so
+questions like "who held rank X on date Y" or "which RSNs has this Discord
+ID had" are index lookups instead of full-file parses.
+
+sync_store() brings the store up to date in one transaction (only snapshots
+not stored yet are inserted). clan_ranks_for_bot.json and
+output/matched_members.json can then be regenerated from the current_roster
+and matched_members views; the exports are byte-identical to what the
+pipeline writes, so regenerating them is a no-op unless the store differs.
+
+The JSON files stay the source of truth the bot and workflows read; the
+store is built from them and can be deleted and rebuilt at any time.
+
+Usage: python -m clan_sync.store [--rebuild] [--export]
+                                 [--rank RANK --on DATE] [--rsn RSN] [--discord-id ID] [--history RSN]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+from functools import lru_cache
+
+from clan_sync.history import sync_history
+from clan_sync.identities import sync_identities
+from clan_sync.ingest import write_roster_json
+from clan_sync.matching import MATCHED_OUTPUT, load_manual_matches
+from clan_sync.outputs import write_json
+from clan_sync.ranks import CLAN_RANKS_FILE, roster_hash
+from clan_sync.roster import normalize, parse_joined_date
+
+STORE_FILE = os.path.join("output", "clan_sync.sqlite3")
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    upload TEXT NOT NULL UNIQUE,
+    captured_at TEXT NOT NULL,
+    roster_hash TEXT NOT NULL,
+    member_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_captured_at ON snapshots (captured_at);
+CREATE TABLE IF NOT EXISTS members (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    rsn TEXT NOT NULL,
+    norm_rsn TEXT NOT NULL,
+    rank TEXT,
+    joined_date TEXT,
+    joined_on TEXT,
+    PRIMARY KEY (snapshot_id, rsn)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS members_rsn ON members (rsn);
+CREATE INDEX IF NOT EXISTS members_norm_rsn ON members (norm_rsn);
+CREATE INDEX IF NOT EXISTS members_rank ON members (snapshot_id, rank);
+CREATE INDEX IF NOT EXISTS members_joined_on ON members (joined_on);
+CREATE TABLE IF NOT EXISTS matches (
+    rsn TEXT PRIMARY KEY,
+    norm_rsn TEXT NOT NULL,
+    discord_id TEXT,
+    discord_user TEXT,
+    nickname TEXT,
+    match_type TEXT,
+    ambiguous INTEGER NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_norm_rsn ON matches (norm_rsn);
+CREATE INDEX IF NOT EXISTS matches_discord_id ON matches (discord_id);
+CREATE TABLE IF NOT EXISTS manual_overrides (
+    rsn TEXT PRIMARY KEY,
+    norm_rsn TEXT NOT NULL,
+    discord_id TEXT,
+    discord_user TEXT,
+    nickname TEXT
+);
+CREATE INDEX IF NOT EXISTS manual_overrides_discord_id ON manual_overrides (discord_id);
+CREATE TABLE IF NOT EXISTS renames (
+    identity_id TEXT NOT NULL,
+    old_rsn TEXT NOT NULL,
+    new_rsn TEXT NOT NULL,
+    joined_date TEXT,
+    joined_on TEXT,
+    upload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renames_old_rsn ON renames (old_rsn);
+CREATE INDEX IF NOT EXISTS renames_new_rsn ON renames (new_rsn);
+CREATE INDEX IF NOT EXISTS renames_identity ON renames (identity_id);
+
+CREATE VIEW IF NOT EXISTS current_roster AS
+    SELECT m.rsn, m.norm_rsn, m.rank, m.joined_date, m.joined_on
+    FROM members m
+    WHERE m.snapshot_id = (SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'current_snapshot');
+CREATE VIEW IF NOT EXISTS matched_members AS
+    SELECT x.rsn, x.discord_id, x.discord_user, x.nickname, x.match_type, x.ambiguous,
+           r.rank, r.joined_date, x.position
+    FROM matches x
+    LEFT JOIN current_roster r ON r.rsn = x.rsn;
+"""
+
+@lru_cache(maxsize=None)
+def _joined_on(joined_date):
+    day = parse_joined_date(joined_date)
+    return day.isoformat() if day else None
+
+def connect(store_file=STORE_FILE):
+    """Open (creating if needed) the store and make sure the schema exists."""
+    os.makedirs(os.path.dirname(store_file) or ".", exist_ok=True)
+    conn = sqlite3.connect(store_file)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        conn.close()
+        raise RuntimeError(f"{store_file} has schema version {version}, expected {SCHEMA_VERSION}; delete it and rerun with --rebuild")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+@contextlib.contextmanager
+def open_store(store_file=STORE_FILE):
+    conn = connect(store_file)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def _stored_uploads(conn):
+    return [upload for upload, in conn.execute("SELECT upload FROM snapshots ORDER BY id")]
+
+def sync_snapshots(conn, history):
+    """
+    Insert the history records not stored yet. If the stored snapshots are
+    no longer a prefix of the history (it was rebuilt), they are replaced.
+    Returns the number of snapshots inserted.
+    """
+    uploads = history.uploads()
+    stored = _stored_uploads(conn)
+    if stored != uploads[:len(stored)]:
+        conn.execute("DELETE FROM snapshots")
+        stored = []
+    if len(stored) == len(uploads):
+        return 0
+
+    for upload, captured_at, roster in history.iter_rosters(len(stored)):
+        snapshot_id = conn.execute(
+            "INSERT INTO snapshots (upload, captured_at, roster_hash, member_count) VALUES (?, ?, ?, ?)",
+            (upload, captured_at, roster_hash(roster), len(roster))
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO members (snapshot_id, rsn, norm_rsn, rank, joined_date, joined_on) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (snapshot_id, rsn, normalize(rsn), info["rank"], info["joinedDate"], _joined_on(info["joinedDate"]))
+                for rsn, info in roster.items()
+            )
+        )
+    return len(uploads) - len(stored)
+
+def sync_matches(conn, matched):
+    conn.execute("DELETE FROM matches")
+    conn.executemany(
+        "INSERT INTO matches (rsn, norm_rsn, discord_id, discord_user, nickname, match_type, ambiguous, position) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (rsn, normalize(rsn), info["discord_id"], info["discord_user"], info["nickname"],
+             info["match_type"], int(info["ambiguous"]), position)
+            for position, (rsn, info) in enumerate(matched.items())
+        )
+    )
+
+def sync_manual_overrides(conn, manual_matches):
+    conn.execute("DELETE FROM manual_overrides")
+    conn.executemany(
+        "INSERT INTO manual_overrides (rsn, norm_rsn, discord_id, discord_user, nickname) VALUES (?, ?, ?, ?, ?)",
+        (
+            (rsn, normalize(rsn), info.get("discord_id"), info.get("discord_user"), info.get("nickname"))
+            for rsn, info in manual_matches.items()
+        )
+    )
+
+def sync_renames(conn, chains):
+    conn.execute("DELETE FROM renames")
+    conn.executemany(
+        "INSERT INTO renames (identity_id, old_rsn, new_rsn, joined_date, joined_on, upload) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (chain["id"], old["rsn"], new["rsn"], chain["joinedDate"], _joined_on(chain["joinedDate"]), new["since"])
+            for chain in chains
+            for old, new in zip(chain["chain"], chain["chain"][1:])
+        )
+    )
+
+def sync_store(history=None, identities=None, matched=None, manual_matches=None, store_file=STORE_FILE):
+    """
+    Bring the store up to date in a single transaction. Whatever is not
+    passed in is loaded: the history and identities are synced, and the
+    matches are read from output/matched_members.json.
+    """
+    if history is None:
+        history = sync_history()
+    if identities is None:
+        identities, _ = sync_identities(history)
+    if matched is None:
+        with open(MATCHED_OUTPUT, "r", encoding="utf-8") as f:
+            matched = json.load(f)
+    if manual_matches is None:
+        manual_matches = load_manual_matches()
+
+    with open_store(store_file) as conn:
+        with conn:
+            inserted = sync_snapshots(conn, history)
+            current = conn.execute("SELECT max(id) FROM snapshots").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('current_snapshot', ?)",
+                (None if current is None else str(current),)
+            )
+            sync_matches(conn, matched)
+            sync_manual_overrides(conn, manual_matches)
+            sync_renames(conn, identities.chains())
+    print(f"🗄️  Store synced: {inserted} new snapshot(s), {len(matched)} matches in {store_file}")
+    return inserted
+
+def current_roster_rows(conn):
+    """(rsn, rank, joinedDate) rows of the current roster, sorted by RSN."""
+    return conn.execute("SELECT rsn, rank, joined_date FROM current_roster ORDER BY rsn").fetchall()
+
+def matched_members(conn):
+    """output/matched_members.json, rebuilt from the matched_members view."""
+    return {
+        rsn: {
+            "discord_id": discord_id,
+            "discord_user": discord_user,
+            "nickname": nickname,
+            "match_type": match_type,
+            "ambiguous": bool(ambiguous),
+            "rank": rank,
+            "joinedDate": joined_date
+        }
+        for rsn, discord_id, discord_user, nickname, match_type, ambiguous, rank, joined_date, _ in conn.execute(
+            "SELECT * FROM matched_members ORDER BY position"
+        )
+    }
+
+def export_views(store_file=STORE_FILE, clan_file=CLAN_RANKS_FILE, matched_file=MATCHED_OUTPUT):
+    """Regenerate the JSON artifacts from the store (no-op where unchanged)."""
+    with open_store(store_file) as conn:
+        rows = current_roster_rows(conn)
+        if rows:
+            write_roster_json(rows, clan_file)
+        write_json(matched_file, matched_members(conn), indent=2)
+
+def members_with_rank(conn, rank, on):
+    """RSNs holding rank in the last snapshot captured on or before the ISO date/time on."""
+    snapshot = conn.execute(
+        "SELECT id, upload FROM snapshots WHERE captured_at <= ? ORDER BY captured_at DESC, id DESC LIMIT 1",
+        (on if "T" in on else f"{on}T23:59:59",)
+    ).fetchone()
+    if snapshot is None:
+        return None, []
+    rsns = [rsn for rsn, in conn.execute(
+        "SELECT rsn FROM members WHERE snapshot_id = ? AND rank = ? ORDER BY rsn", (snapshot[0], rank)
+    )]
+    return snapshot[1], rsns
+
+def discord_for_rsn(conn, rsn):
+    """The match for an RSN, falling back to its normalized form."""
+    columns = "rsn, discord_id, discord_user, nickname, match_type"
+    row = conn.execute(f"SELECT {columns} FROM matches WHERE rsn = ?", (rsn,)).fetchone()
+    if row is None:
+        row = conn.execute(
+            f"SELECT {columns} FROM matches WHERE norm_rsn = ? ORDER BY position LIMIT 1", (normalize(rsn),)
+        ).fetchone()
+    return row
+
+def rsns_for_discord_id(conn, discord_id):
+    """Every RSN matched or manually assigned to a Discord ID, plus the names those RSNs were renamed from."""
+    rsns = [rsn for rsn, in conn.execute(
+        "SELECT rsn FROM matches WHERE discord_id = ? UNION SELECT rsn FROM manual_overrides WHERE discord_id = ?",
+        (discord_id, discord_id)
+    )]
+    previous = []
+    for rsn in rsns:
+        previous.extend(name for name, in conn.execute(
+            "SELECT old_rsn FROM renames WHERE identity_id IN (SELECT identity_id FROM renames WHERE new_rsn = ?)",
+            (rsn,)
+        ))
+    return sorted(rsns), sorted(set(previous) - set(rsns))
+
+def rsn_history(conn, rsn):
+    """(upload, captured_at, rank, joinedDate) for every snapshot the RSN appears in."""
+    return conn.execute(
+        "SELECT s.upload, s.captured_at, m.rank, m.joined_date FROM members m "
+        "JOIN snapshots s ON s.id = m.snapshot_id WHERE m.rsn = ? ORDER BY s.id",
+        (rsn,)
+    ).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the SQLite store.")
+    parser.add_argument("--rebuild", action="store_true", help="delete the store and rebuild it from the JSON files")
+    parser.add_argument("--export", action="store_true", help="regenerate clan_ranks_for_bot.json and matched_members.json from the store")
+    parser.add_argument("--rank", help="list members holding this rank (with --on)")
+    parser.add_argument("--on", help="ISO date or timestamp for --rank (default: latest snapshot)")
+    parser.add_argument("--rsn", help="show the Discord match for an RSN")
+    parser.add_argument("--discord-id", help="list the RSNs linked to a Discord ID")
+    parser.add_argument("--history", metavar="RSN", help="show an RSN's rank and joinedDate in every snapshot")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.isfile(STORE_FILE):
+        os.remove(STORE_FILE)
+    querying = args.rank or args.rsn or args.discord_id or args.history
+    if args.rebuild or not querying:
+        sync_store()
+    if args.export:
+        export_views()
+
+    with open_store() as conn:
+        if args.rank:
+            upload, rsns = members_with_rank(conn, args.rank, args.on or "9999-12-31")
+            print(f"{len(rsns)} member(s) with rank {args.rank} in {upload}:")
+            for rsn in rsns:
+                print(f"  {rsn}")
+        if args.rsn:
+            row = discord_for_rsn(conn, args.rsn)
+            print(json.dumps(dict(zip(("rsn", "discord_id", "discord_user", "nickname", "match_type"), row)) if row else None, indent=2))
+        if args.discord_id:
+            rsns, previous = rsns_for_discord_id(conn, args.discord_id)
+            print(json.dumps({"rsns": rsns, "previous_rsns": previous}, indent=2))
+        if args.history:
+            for upload, captured_at, rank, joined_date in rsn_history(conn, args.history):
+                print(f"  {captured_at}  {rank:<16} {joined_date}  {upload}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Tenure and rank-progression rollups over the roster history.
+
+One pass over the upload history keeps, for every member, their current
+rank, when they got it and the timeline of rank changes; later runs only
+scan the uploads appended since, and rescan everything when the uploads
+already scanned are no longer a prefix of the history (like
+clan_sync.identities). Timelines are
+keyed by the member ids of clan_sync.identities, so a member who leaves and
+comes back, or is renamed, keeps their timeline exactly when the identity
+index follows them. Time at rank is measured from the capture time of
+the first upload showing the rank, so for members who already had their
+rank when the history starts it is a lower bound ("since_history_start").
+
+All dates are relative to the latest upload's capture time, so the files
+only change when a new upload does.
+
+Outputs (small, precomputed, for the bot to serve as-is):
+  output/rank_timelines.json   scan state: per-member rank timelines and
+                               period counters
+  output/rank_counts.json      members per rank
+  output/tenure_buckets.json   members per time-in-clan bucket, overall and per rank
+  output/rank_changes.json     rank changes per month and ISO week, and the
+                               changes of the last RECENT_DAYS days
+  output/promotion_due.json    members at their rank for at least the
+                               minimum days, longest first
+
+data/promotion_rules.json (optional) sets the policy:
+  {"ladder": [lowest rank, ..., highest rank],
+   "min_days_at_rank": {rank: days}, "default_min_days": 90}
+With a ladder, rank changes are split into promotions and demotions and only
+ranks below the top of the ladder can be due; without the file every rank
+is due after DEFAULT_MIN_DAYS.
+
+Usage: python -m clan_sync.tenure [--rebuild] [--due]
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from itertools import groupby
+
+from clan_sync.history import sync_history
+from clan_sync.identities import member_resolver, sync_identities
+from clan_sync.outputs import write_json
+from clan_sync.roster import joined_day
+
+TIMELINES_FILE = os.path.join("output", "rank_timelines.json")
+RANK_COUNTS_FILE = os.path.join("output", "rank_counts.json")
+TENURE_BUCKETS_FILE = os.path.join("output", "tenure_buckets.json")
+RANK_CHANGES_FILE = os.path.join("output", "rank_changes.json")
+PROMOTION_DUE_FILE = os.path.join("output", "promotion_due.json")
+PROMOTION_RULES_FILE = os.path.join("data", "promotion_rules.json")
+TIMELINES_VERSION = 2
+
+DEFAULT_MIN_DAYS = 90
+RECENT_DAYS = 30
+# Kept in the state so "recent" never needs a rescan; older entries are only in the period counts
+MAX_RECENT_CHANGES = 500
+# (upper bound in days, label); None is open-ended
+TENURE_BUCKETS = [
+    (30, "under 1 month"),
+    (90, "1-3 months"),
+    (180, "3-6 months"),
+    (365, "6-12 months"),
+    (730, "1-2 years"),
+    (None, "2+ years")
+]
+
+def _day(captured_at):
+    return datetime.fromisoformat(captured_at).date()
+
+def tenure_bucket(days):
+    if days is None:
+        return "unknown"
+    for limit, label in TENURE_BUCKETS:
+        if limit is None or days < limit:
+            return label
+
+def load_promotion_rules(rules_file=PROMOTION_RULES_FILE):
+    if not os.path.isfile(rules_file):
+        return {}
+    with open(rules_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class TenureIndex:
+    """
+    members:  member id -> {"rsn", "rank", "joinedDate", "rank_since", "first_seen", "timeline": [[captured_at, rank], ...]}
+    departed: member id -> the same, for members no longer on the roster
+    periods:  {"month": {"YYYY-MM": n}, "week": {"YYYY-Www": n}} rank changes per period
+    recent:   the latest rank changes, newest last
+    scanned:  the uploads scanned so far, in history order
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.scanned = state.get("scanned", [])
+        self.last_upload = state.get("last_upload")
+        self.history_start = state.get("history_start")
+        self.as_of = state.get("as_of")
+        self.members = state.get("members", {})
+        self.departed = state.get("departed", {})
+        self.periods = state.get("periods", {"month": {}, "week": {}})
+        self.recent = state.get("recent", [])
+
+    def to_state(self):
+        return {
+            "version": TIMELINES_VERSION,
+            "last_upload": self.last_upload,
+            "scanned": self.scanned,
+            "history_start": self.history_start,
+            "as_of": self.as_of,
+            "members": dict(sorted(self.members.items(), key=lambda item: int(item[0]))),
+            "departed": dict(sorted(self.departed.items(), key=lambda item: int(item[0]))),
+            "periods": {period: dict(sorted(counts.items())) for period, counts in self.periods.items()},
+            "recent": self.recent
+        }
+
+    def start(self, upload, captured_at, roster, resolve):
+        """
+        Begin from the first upload's roster (RSN -> {"rank", "joinedDate"});
+        resolve(rsn, upload) gives the member id (see identities.member_resolver).
+        """
+        self.history_start = captured_at
+        for rsn, info in roster.items():
+            self._add(resolve(rsn, upload), rsn, info["rank"], info["joinedDate"], captured_at)
+        self.last_upload = upload
+        self.as_of = captured_at
+
+    def _add(self, member_id, rsn, rank, joined_date, captured_at):
+        self.members[member_id] = {
+            "rsn": rsn,
+            "rank": rank,
+            "joinedDate": joined_date,
+            "rank_since": captured_at,
+            "first_seen": captured_at,
+            "timeline": [[captured_at, rank]]
+        }
+
+    def _set_rank(self, member_id, rank, captured_at):
+        member = self.members[member_id]
+        if member["rank"] == rank:
+            return
+        old_rank = member["rank"]
+        member["rank"] = rank
+        member["rank_since"] = captured_at
+        member["timeline"].append([captured_at, rank])
+
+        day = _day(captured_at)
+        year, week, _ = day.isocalendar()
+        months, weeks = self.periods["month"], self.periods["week"]
+        months[f"{day:%Y-%m}"] = months.get(f"{day:%Y-%m}", 0) + 1
+        weeks[f"{year}-W{week:02d}"] = weeks.get(f"{year}-W{week:02d}", 0) + 1
+        self.recent.append({"id": member_id, "rsn": member["rsn"], "from": old_rank, "to": rank, "at": captured_at})
+        del self.recent[:-MAX_RECENT_CHANGES]
+
+    def apply_upload(self, upload, captured_at, events, resolve, previous_upload):
+        """
+        Apply one upload's change events (see RosterHistory.iter_changes).
+        Leavers are resolved to member ids at previous_upload, everyone else
+        at upload, so a rename or a return brings the departed timeline back.
+        """
+        for event in events:
+            if event["type"] == "left":
+                member_id = resolve(event["rsn"], previous_upload)
+                if member_id in self.members:
+                    self.departed[member_id] = self.members.pop(member_id)
+
+        for event in sorted(events, key=lambda e: e["rsn"]):
+            if event["type"] not in ("joined", "changed"):
+                continue
+            member_id = resolve(event["rsn"], upload)
+            if member_id is None:
+                continue
+            if member_id in self.departed:
+                self.members[member_id] = self.departed.pop(member_id)
+            if member_id not in self.members:
+                self._add(member_id, event["rsn"], event["rank"], event["joinedDate"], captured_at)
+            member = self.members[member_id]
+            member["rsn"] = event["rsn"]
+            member["joinedDate"] = event["joinedDate"]
+            self._set_rank(member_id, event["rank"], captured_at)
+
+        self.last_upload = upload
+        self.as_of = captured_at
+
+    def days_at_rank(self, member_id, today):
+        return (today - _day(self.members[member_id]["rank_since"])).days
+
+    def rank_counts(self):
+        counts = {}
+        for member in self.members.values():
+            counts[member["rank"]] = counts.get(member["rank"], 0) + 1
+        return {"as_of": self.as_of, "total": len(self.members), "ranks": dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))}
+
+    def tenure_buckets(self):
+        today = _day(self.as_of)
+        labels = [label for _, label in TENURE_BUCKETS] + ["unknown"]
+        overall = dict.fromkeys(labels, 0)
+        by_rank = {}
+        for member in self.members.values():
+            day = joined_day(member["joinedDate"]) if isinstance(member["joinedDate"], str) else 0
+            label = tenure_bucket(today.toordinal() - day if day else None)
+            overall[label] += 1
+            rank_buckets = by_rank.setdefault(member["rank"], dict.fromkeys(labels, 0))
+            rank_buckets[label] += 1
+        return {"as_of": self.as_of, "buckets": overall, "by_rank": dict(sorted(by_rank.items()))}
+
+    def rank_changes(self, rules=None):
+        ladder = {rank: i for i, rank in enumerate((rules or {}).get("ladder", []))}
+        today = _day(self.as_of)
+        recent = []
+        for change in reversed(self.recent):
+            if (today - _day(change["at"])).days > RECENT_DAYS:
+                break
+            entry = dict(change)
+            if change["from"] in ladder and change["to"] in ladder:
+                entry["direction"] = "promotion" if ladder[change["to"]] > ladder[change["from"]] else "demotion"
+            recent.append(entry)
+        return {
+            "as_of": self.as_of,
+            "history_start": self.history_start,
+            "per_month": self.periods["month"],
+            "per_week": self.periods["week"],
+            "recent_days": RECENT_DAYS,
+            "recent": recent
+        }
+
+    def promotion_due(self, rules=None):
+        """Members at their rank for at least its minimum days, longest first."""
+        rules = rules or {}
+        ladder = rules.get("ladder")
+        min_days = rules.get("min_days_at_rank", {})
+        default_min_days = rules.get("default_min_days", DEFAULT_MIN_DAYS)
+        today = _day(self.as_of)
+        due = []
+        for member_id, member in self.members.items():
+            rank = member["rank"]
+            if ladder is not None and (rank not in ladder or rank == ladder[-1]):
+                continue
+            required = min_days.get(rank, default_min_days)
+            days = self.days_at_rank(member_id, today)
+            if required is None or days < required:
+                continue
+            due.append({
+                "id": member_id,
+                "rsn": member["rsn"],
+                "rank": rank,
+                "days_at_rank": days,
+                "required_days": required,
+                "rank_since": member["rank_since"],
+                "since_history_start": member["rank_since"] == self.history_start,
+                "joinedDate": member["joinedDate"]
+            })
+        due.sort(key=lambda entry: (-entry["days_at_rank"], entry["rsn"]))
+        return {"as_of": self.as_of, "members": due}
+
+def load_tenure(timelines_file=TIMELINES_FILE):
+    if not os.path.isfile(timelines_file):
+        return TenureIndex()
+    with open(timelines_file, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != TIMELINES_VERSION:
+        return TenureIndex()
+    return TenureIndex(state)
+
+def write_rollups(index, rules=None):
+    write_json(RANK_COUNTS_FILE, index.rank_counts(), indent=2)
+    write_json(TENURE_BUCKETS_FILE, index.tenure_buckets(), indent=2)
+    write_json(RANK_CHANGES_FILE, index.rank_changes(rules), indent=2)
+    write_json(PROMOTION_DUE_FILE, index.promotion_due(rules), indent=2)
+
+def sync_tenure(history=None, identities=None, rebuild=False):
+    """
+    Scan the uploads added to the history since the last run (all of them
+    if rebuild is set or the uploads already scanned are no longer a prefix
+    of the history), then save the timelines and rollups. identities is the
+    IdentityIndex synced to the same history (synced here if not given).
+    Returns the index.
+    """
+    if history is None:
+        history = sync_history()
+    if identities is None:
+        identities, _ = sync_identities(history)
+    index = TenureIndex() if rebuild else load_tenure()
+    uploads = history.uploads()
+    if not uploads:
+        return index
+    resolve = member_resolver(identities, uploads)
+
+    if not index.scanned or index.scanned != uploads[:len(index.scanned)]:
+        index = TenureIndex()
+        first = history.records[0]
+        index.start(first["upload"], first["captured_at"], history.roster_at(0), resolve)
+        index.scanned = uploads[:1]
+
+    previous_upload = index.scanned[-1]
+    changes = history.iter_changes(len(index.scanned) - 1, -1)
+    for (upload, captured_at), events in groupby(changes, key=lambda event: (event["upload"], event["captured_at"])):
+        index.apply_upload(upload, captured_at, list(events), resolve, previous_upload)
+        previous_upload = upload
+    # Uploads with no changes still move the reference date
+    index.scanned = uploads
+    index.last_upload = uploads[-1]
+    index.as_of = history.records[-1]["captured_at"]
+
+    write_json(TIMELINES_FILE, index.to_state(), indent=2)
+    write_rollups(index, load_promotion_rules())
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank timelines, tenure and promotion rollups from the upload history.")
+    parser.add_argument("--rebuild", action="store_true", help="rescan the whole upload history")
+    parser.add_argument("--due", action="store_true", help="print the members due for promotion")
+    args = parser.parse_args()
+
+    index = sync_tenure(rebuild=args.rebuild)
+    print(f"📈 {len(index.members)} members as of {index.as_of}, {sum(index.periods['month'].values())} rank changes since {index.history_start}")
+    if args.due:
+        for entry in index.promotion_due(load_promotion_rules())["members"]:
+            bound = "+" if entry["since_history_start"] else ""
+            print(f"  {entry['rsn']:<14} {entry['rank']:<14} {entry['days_at_rank']}{bound} days (needs {entry['required_days']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Batched character-trigram scorer for the fuzzy matching priority.
+
+Every candidate (normalized RSN) and every name to look up is encoded as a
+vector of character-trigram counts, and each name's top-k candidates by
+cosine similarity come out of one matrix product. SequenceMatcher then only
+confirms that short list against the usual threshold.
+
+Uses scipy.sparse (with NumPy) when available, otherwise a pure-Python
+inverted index over the same vectors (same scores; ties for the k-th place
+may be broken differently). There is no dense fallback: a dense matrix
+is O(candidates x trigrams) and does not fit at 100k members. Unlike FuzzyIndex this is approximate:
+a candidate outside a name's top-k is never confirmed, so it is opt-in
+(--scorer trigram).
+"""
+import heapq
+import math
+from difflib import SequenceMatcher
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+TOP_K = 10
+
+def trigrams(text):
+    """Trigram counts of text, padded so short names still get trigrams."""
+    padded = f"^{text}$"
+    grams = {}
+    for i in range(len(padded) - 2):
+        gram = padded[i:i + 3]
+        grams[gram] = grams.get(gram, 0) + 1
+    return grams
+
+class TrigramIndex:
+    """
+    Drop-in alternative to FuzzyIndex: match(name) returns the best
+    candidate at or above the threshold, or None. prepare(names) computes
+    the short lists for a whole batch of names at once.
+    """
+
+    def __init__(self, candidates, threshold=0.85, top_k=TOP_K):
+        self.threshold = threshold
+        self.top_k = top_k
+        self.examined = 0          # candidates compared with SequenceMatcher, for metrics
+        self.candidates = []       # distinct candidates, in first-seen order
+        self.vocab = {}            # trigram -> column
+        self.vectors = []          # per candidate: {column: count}
+        self.shortlists = {}       # name -> [candidate id], filled by prepare()
+        seen = set()
+        for candidate in candidates:
+            candidate = candidate.lower()
+            if candidate in seen:
+                continue
+            seen.add(candidate)
+            self.candidates.append(candidate)
+            self.vectors.append({
+                self.vocab.setdefault(gram, len(self.vocab)): count
+                for gram, count in trigrams(candidate).items()
+            })
+        self.norms = [math.sqrt(sum(c * c for c in vector.values())) for vector in self.vectors]
+        self.matrix = self._candidate_matrix()
+        self.postings = None
+
+    def _candidate_matrix(self):
+        """Row-normalized sparse candidate x trigram matrix, or None without SciPy."""
+        if sparse is None or np is None or not self.candidates:
+            return None
+        rows, cols, values = [], [], []
+        for cid, vector in enumerate(self.vectors):
+            for col, count in vector.items():
+                rows.append(cid)
+                cols.append(col)
+                values.append(count / self.norms[cid])
+        shape = (len(self.candidates), len(self.vocab))
+        return sparse.csr_matrix((values, (rows, cols)), shape=shape, dtype=np.float32)
+
+    def _query_vector(self, name):
+        return {
+            self.vocab[gram]: count
+            for gram, count in trigrams(name).items()
+            if gram in self.vocab
+        }
+
+    def prepare(self, names):
+        """Compute and keep the top-k candidate short list of every name."""
+        names = [name.lower() for name in dict.fromkeys(names) if name and name.lower() not in self.shortlists]
+        if not names or not self.candidates:
+            return
+        if self.matrix is None:
+            for name in names:
+                self.shortlists[name] = self._python_top_k(name)
+            return
+
+        rows, cols, values = [], [], []
+        for row, name in enumerate(names):
+            for col, count in self._query_vector(name).items():
+                rows.append(row)
+                cols.append(col)
+                values.append(count)
+        shape = (len(names), len(self.vocab))
+        queries = sparse.csr_matrix((values, (rows, cols)), shape=shape, dtype=np.float32)
+        scores = (queries @ self.matrix.T).tocsr()
+        for row, name in enumerate(names):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            self.shortlists[name] = self._top_k(scores.indices[start:end], scores.data[start:end])
+
+    def _top_k(self, ids, scores):
+        if len(ids) > self.top_k:
+            keep = np.argpartition(-scores, self.top_k - 1)[:self.top_k]
+            ids = ids[keep]
+        return sorted(int(cid) for cid in ids)
+
+    def _python_top_k(self, name):
+        if self.postings is None:
+            self.postings = {}
+            for cid, vector in enumerate(self.vectors):
+                for col, count in vector.items():
+                    self.postings.setdefault(col, []).append((cid, count / self.norms[cid]))
+        scores = {}
+        for col, count in self._query_vector(name).items():
+            for cid, weight in self.postings.get(col, ()):
+                scores[cid] = scores.get(cid, 0.0) + count * weight
+        return sorted(heapq.nlargest(self.top_k, scores, key=scores.get))
+
+    def match(self, name):
+        name = name.lower()
+        if not name or not self.candidates:
+            return None
+        if name not in self.shortlists:
+            self.prepare([name])
+
+        # Ties keep the earliest candidate, as in fuzzy_match
+        best_score = 0
+        best_match = None
+        shortlist = self.shortlists.get(name, ())
+        self.examined += len(shortlist)
+        for cid in shortlist:
+            matcher = SequenceMatcher(None, name, self.candidates[cid])
+            if matcher.real_quick_ratio() < self.threshold:
+                continue
+            upper_bound = matcher.quick_ratio()
+            if upper_bound < self.threshold or upper_bound <= best_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best_score = score
+                best_match = self.candidates[cid]
+        return best_match if best_score >= self.threshold else None
@@ -0,0 +1,56 @@
+"""
+Carry Discord matches over to renamed RSNs.
+
+matched_members.json already follows renames by itself: matching gives a
+renamed member their saved Discord link back (match type "identity", see
+clan_sync.identities). updated_matched_members.json is still written for
+the renames in latest_rsn_changes.json, for consumers that read it.
+"""
+import json
+
+from clan_sync.outputs import write_json
+
+INPUT_MATCHED_FILE = "output/matched_members.json"
+OUTPUT_UPDATED_FILE = "output/updated_matched_members.json"
+
+def apply_rsn_changes(matched_members, rsn_changes):
+    """
+    Returns (updated_matches, unmatched_renames): the match info of each old
+    RSN keyed by its new RSN, and the renames with no matching entry.
+    """
+    # Look up each rename directly rather than indexing the whole table
+    updated_matches = {}
+    unmatched_renames = []
+
+    for entry in rsn_changes:
+        old_rsn = entry["old_rsn"]
+        new_rsn = entry["new_rsn"]
+        joined_date = entry["joinedDate"]
+
+        match_info = matched_members.get(old_rsn)
+        if match_info and joined_date and match_info.get("joinedDate") == joined_date:
+            updated_matches[new_rsn] = match_info
+        else:
+            unmatched_renames.append(entry)
+
+    return updated_matches, unmatched_renames
+
+def update_matched_members(rsn_changes, matched_members=None):
+    """Write updated_matched_members.json for the given RSN changes."""
+    if matched_members is None:
+        with open(INPUT_MATCHED_FILE, "r", encoding="utf-8") as f:
+            matched_members = json.load(f)
+
+    updated_matches, unmatched_renames = apply_rsn_changes(matched_members, rsn_changes)
+
+    # Save result
+    write_json(OUTPUT_UPDATED_FILE, updated_matches, indent=2)
+
+    # Print summary
+    print(f"✅ New RSNs matched: {len(updated_matches)}")
+    print(f"❌ Renames unmatched: {len(unmatched_renames)}")
+    if unmatched_renames:
+        print("\nUnmatched renames:")
+        for entry in unmatched_renames:
+            print(f"  {entry['old_rsn']} → {entry['new_rsn']} (joined {entry['joinedDate']})")
+    return updated_matches, unmatched_renames
@@ -0,0 +1,167 @@
+"""
+Manifest of the Clanmate Export uploads in uploads/.
+
+Each upload is recorded once with its capture time (parsed from the
+clanrank_YYYYMMDD_HHMMSS.json name), size, content hash, member count and
+clanName (None if the upload has none),
+so finding the latest uploads is a lookup rather than a directory walk
+with a stat call per file. File modification times are not used: a fresh
+checkout resets them all.
+
+The roster, history and renames only read the uploads of this directory's
+clan (see clan_sync.shards): the primary clan in clans/index.json, or the
+clanName of the earliest upload. Uploads without a clanName count as its;
+uploads of other clans are left for clan_sync.shards to move to their shard.
+
+Usage: python -m clan_sync.uploads [--rebuild]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from clan_sync.ingest import CHUNK_SIZE, iter_upload
+from clan_sync.outputs import write_json
+
+UPLOADS_DIR = "uploads"
+MANIFEST_FILE = os.path.join("output", "uploads_manifest.json")
+MANIFEST_VERSION = 2
+CLAN_INDEX_FILE = os.path.join("clans", "index.json")
+
+UPLOAD_NAME_RE = re.compile(r"^clanrank_(\d{8}_\d{6})\.json$")
+
+def capture_time(filename):
+    """Capture timestamp (ISO format) from an upload file name, or None."""
+    m = UPLOAD_NAME_RE.match(os.path.basename(filename))
+    if not m:
+        return None
+    try:
+        return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S").isoformat()
+    except ValueError:
+        return None
+
+def describe_upload(path):
+    """Manifest entry for one upload file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    header = {}
+    try:
+        members = sum(1 for _ in iter_upload(path, header=header))
+    except ValueError:
+        members = None
+    clan = header.get("clanName")
+    return {
+        "file": os.path.basename(path),
+        "captured_at": capture_time(path),
+        "size": os.path.getsize(path),
+        "sha256": digest.hexdigest(),
+        "members": members,
+        "clan": clan if isinstance(clan, str) and clan.strip() else None
+    }
+
+def _sorted_entries(entries):
+    return sorted(entries, key=lambda e: (e["captured_at"], e["file"]))
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    if not os.path.isfile(manifest_file):
+        return None
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    write_json(manifest_file, manifest, indent=2)
+
+def _upload_names(uploads_dir):
+    if not os.path.isdir(uploads_dir):
+        return set()
+    return {name for name in os.listdir(uploads_dir) if capture_time(name)}
+
+def rebuild_manifest(uploads_dir=UPLOADS_DIR, manifest_file=MANIFEST_FILE, save=True):
+    """Regenerate the manifest from every upload in the directory."""
+    entries = [describe_upload(os.path.join(uploads_dir, name)) for name in _upload_names(uploads_dir)]
+    manifest = {"version": MANIFEST_VERSION, "uploads": _sorted_entries(entries)}
+    if save:
+        save_manifest(manifest, manifest_file)
+    return manifest
+
+def register_upload(path, manifest_file=MANIFEST_FILE):
+    """Add (or refresh) one upload in the manifest, e.g. right after saving it."""
+    manifest = load_manifest(manifest_file) or {"version": MANIFEST_VERSION, "uploads": []}
+    entry = describe_upload(path)
+    entries = [e for e in manifest["uploads"] if e["file"] != entry["file"]]
+    manifest["uploads"] = _sorted_entries(entries + [entry])
+    save_manifest(manifest, manifest_file)
+    return entry
+
+def sync_manifest(uploads_dir=UPLOADS_DIR, manifest_file=MANIFEST_FILE, save=True):
+    """
+    Bring the manifest up to date with the upload names on disk. Only new
+    files are read; known files are not stat'ed or re-hashed. With
+    save=False the updated manifest is only returned, e.g. for a lookup
+    that may turn out to be a no-op.
+    """
+    manifest = load_manifest(manifest_file)
+    if manifest is None:
+        return rebuild_manifest(uploads_dir, manifest_file, save)
+
+    on_disk = _upload_names(uploads_dir)
+    known = {e["file"] for e in manifest["uploads"]}
+    if on_disk == known:
+        return manifest
+
+    entries = [e for e in manifest["uploads"] if e["file"] in on_disk]
+    entries += [describe_upload(os.path.join(uploads_dir, name)) for name in sorted(on_disk - known)]
+    manifest["uploads"] = _sorted_entries(entries)
+    if save:
+        save_manifest(manifest, manifest_file)
+    return manifest
+
+def load_index(index_file=CLAN_INDEX_FILE):
+    if not os.path.isfile(index_file):
+        return None
+    with open(index_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def primary_clan(manifest, index=None):
+    """The clan this directory syncs: the index's primary clan, else the earliest upload's clanName."""
+    if index and index.get("primary"):
+        return index["primary"]
+    return next((entry["clan"] for entry in manifest["uploads"] if entry.get("clan")), None)
+
+def clan_uploads(manifest, clan=None):
+    """Manifest entries of one clan (default: the primary clan), uploads without a clanName included."""
+    clan = clan or primary_clan(manifest, load_index())
+    return [entry for entry in manifest["uploads"] if entry.get("clan") in (None, clan)]
+
+def latest_uploads(n=1, uploads_dir=UPLOADS_DIR, manifest_file=MANIFEST_FILE, save=True):
+    """Paths of the primary clan's n most recently captured uploads (all if n is None), newest first."""
+    entries = clan_uploads(sync_manifest(uploads_dir, manifest_file, save))
+    if n is None:
+        newest = entries
+    else:
+        newest = entries[-n:] if n > 0 else []
+    return [os.path.join(uploads_dir, e["file"]) for e in reversed(newest)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the uploads/ manifest.")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate the manifest from scratch")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        manifest = rebuild_manifest()
+    else:
+        manifest = sync_manifest()
+    print(f"{len(manifest['uploads'])} uploads in {MANIFEST_FILE}")
+    if manifest["uploads"]:
+        latest = manifest["uploads"][-1]
+        print(f"Latest: {latest['file']} ({latest['members']} members, captured {latest['captured_at']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Long-running watch mode: resync as soon as an upload or the Discord export changes.
+
+The watcher polls uploads/, data/discord_members.csv and
+data/manual_matches.json (stat only, every --interval seconds) and waits for
+a change to settle for --debounce seconds before syncing, so a file still
+being written is never read half-way. Between syncs it keeps the parsed
+roster, the matcher's normalized-name indexes, the Discord table, the
+identity links and the match cache in memory, and only reruns the stages
+an input affects:
+
+  new upload          process_upload, history, renames, tenure, index, matching, updates
+                      (the same stages as clan_sync.pipeline)
+  Discord export      matching, updates
+  manual matches      matching, updates
+
+Like python -m clan_sync it only syncs the primary clan's uploads; uploads
+of other clans are picked up by clan_sync.shards.
+
+After every sync output/watch_health.json is rewritten with the state of the
+daemon, what triggered the last sync, its stage timings and the end-to-end
+latency from the input's mtime; output/pipeline_metrics.json gets the stage
+metrics as for the other entry points.
+
+Usage: python -m clan_sync.watch [--interval S] [--debounce S] [--workers N] [--scorer exact|trigram] [--compact] [--commit]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+from clan_sync.compact import write_compact_exports
+from clan_sync.feed import process_and_publish
+from clan_sync.identities import carried_links, link_matches, load_identities, load_identity_links, save_identity_links
+from clan_sync.matching import (
+    DISCORD_FILE, MANUAL_MATCHES_FILE, SCORERS, RosterMatcher, inputs_fingerprint, load_clan_data,
+    load_discord_members, load_manual_matches, load_match_cache, match_members, write_match_results
+)
+from clan_sync.metrics import PipelineMetrics, stage
+from clan_sync.outputs import commit_changes, report_changes, reset_outputs
+from clan_sync.ranks import CLAN_RANKS_FILE
+from clan_sync.pipeline import run_history_stages
+from clan_sync.renames import load_rsn_changes
+from clan_sync.updates import update_matched_members
+from clan_sync.uploads import UPLOADS_DIR
+
+HEALTH_FILE = os.path.join("output", "watch_health.json")
+POLL_INTERVAL = 0.1
+DEBOUNCE = 0.25
+COMMIT_MESSAGE = "Watch sync update"
+
+def snapshot_inputs(uploads_dir=UPLOADS_DIR, discord_file=DISCORD_FILE, manual_file=MANUAL_MATCHES_FILE):
+    """{input: {path: (mtime_ns, size)}} for the uploads, the Discord export and the manual matches."""
+    def stat(path):
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        return {str(path): (info.st_mtime_ns, info.st_size)}
+
+    uploads = {}
+    if os.path.isdir(uploads_dir):
+        with os.scandir(uploads_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    info = entry.stat()
+                    uploads[entry.path] = (info.st_mtime_ns, info.st_size)
+    return {"uploads": uploads, "discord": stat(discord_file), "manual": stat(manual_file)}
+
+def changed_inputs(old, new):
+    return {name for name in new if new[name] != old.get(name)}
+
+def newest_mtime(snapshot, names):
+    mtimes = [mtime for name in names for mtime, _ in snapshot[name].values()]
+    return max(mtimes) / 1e9 if mtimes else None
+
+class WarmState:
+    """Everything a sync needs that is expensive to rebuild, kept between syncs."""
+
+    def __init__(self, scorer="exact", workers=1, full=False, compact=False):
+        self.scorer = scorer
+        self.workers = workers
+        self.compact = compact
+        self.roster = load_clan_data() if os.path.isfile(CLAN_RANKS_FILE) else None
+        self.matcher = None
+        self.discord_members = None
+        self.manual_matches = None
+        self.match_cache = None if full else load_match_cache()
+        self.rsn_changes = load_rsn_changes()
+        self.identities = load_identities()
+        self.links = load_identity_links()
+        self.matched = None
+
+    def _matcher(self):
+        if self.matcher is None:
+            self.matcher = RosterMatcher(self.roster.rsns(), [member.norm_rsn for member in self.roster], self.scorer)
+        return self.matcher
+
+    def sync(self, changed, metrics=None):
+        """
+        Rerun the stages affected by the changed inputs ("uploads",
+        "discord", "manual"). Returns the names of the stages that ran.
+        """
+        ran = []
+        if "uploads" in changed:
+            with stage(metrics, "process_upload"):
+                roster = process_and_publish(inputs_hash=inputs_fingerprint())
+            ran.append("process_upload")
+            if roster is not None:
+                self.roster = roster
+                self.matcher = None
+                _, self.identities, self.rsn_changes = run_history_stages(metrics)
+                ran += ["history", "renames", "tenure"]
+            elif self.matched is not None and not changed - {"uploads"}:
+                # Same roster as before and nothing else changed
+                return ran
+        if "discord" in changed or self.discord_members is None:
+            with stage(metrics, "load_discord"):
+                self.discord_members = load_discord_members()
+        if "manual" in changed or self.manual_matches is None:
+            self.manual_matches = load_manual_matches()
+        if self.roster is None:
+            print("🟡 No roster yet, waiting for an upload.")
+            return ran
+
+        with stage(metrics, "index"):
+            matcher = self._matcher()
+        with stage(metrics, "matching"):
+            results = match_members(
+                self.roster, self.discord_members, self.manual_matches, match_cache=self.match_cache,
+                workers=self.workers, scorer=self.scorer, metrics=metrics, matcher=matcher,
+                carried=carried_links(self.identities, self.links)
+            )
+            with stage(metrics, "matching.write"):
+                write_match_results(results)
+                link_matches(self.identities, self.links, results["matched"])
+                if self.links:
+                    save_identity_links(self.links)
+        self.match_cache = results["match_cache"]
+        self.matched = results["matched"]
+        ran.append("matching")
+        if self.compact:
+            with stage(metrics, "compact"):
+                write_compact_exports(self.roster, self.matched)
+            ran.append("compact")
+
+        with stage(metrics, "updates"):
+            if self.rsn_changes is not None:
+                update_matched_members(self.rsn_changes, matched_members=self.matched)
+        ran.append("updates")
+        return ran
+
+class Watcher:
+    def __init__(self, state, interval=POLL_INTERVAL, debounce=DEBOUNCE, commit=False, health_file=HEALTH_FILE):
+        self.state = state
+        self.interval = interval
+        self.debounce = debounce
+        self.commit = commit
+        self.health_file = health_file
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.syncs = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_sync = None
+        self.latencies = []        # end-to-end seconds of the recent syncs
+
+    def health(self):
+        latencies = sorted(self.latencies)
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "interval": self.interval,
+            "debounce": self.debounce,
+            "syncs": self.syncs,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "roster_size": len(self.state.roster) if self.state.roster is not None else None,
+            "matched": len(self.state.matched) if self.state.matched is not None else None,
+            "latency_seconds": {
+                "last": round(self.latencies[-1], 6),
+                "median": round(latencies[len(latencies) // 2], 6),
+                "max": round(latencies[-1], 6)
+            } if latencies else None,
+            "last_sync": self.last_sync
+        }
+
+    def write_health(self):
+        # Rewritten after every sync and never committed, so not through clan_sync.outputs
+        os.makedirs(os.path.dirname(self.health_file), exist_ok=True)
+        temp_file = f"{self.health_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self.health(), f, indent=2)
+        os.replace(temp_file, self.health_file)
+
+    def run_sync(self, changed, changed_at=None):
+        reset_outputs()
+        metrics = PipelineMetrics("python -m clan_sync.watch")
+        metrics.start()
+        ran = []
+        try:
+            ran = self.state.sync(changed, metrics)
+            if self.commit:
+                with metrics.stage("git"):
+                    commit_changes(COMMIT_MESSAGE)
+        except Exception as e:
+            # Keep watching; the next change gets a fresh attempt
+            self.errors += 1
+            self.last_error = f"{datetime.now().isoformat(timespec='seconds')} {type(e).__name__}: {e}"
+            print(f"❌ Sync failed: {e}")
+        metrics.stop()
+        finished = time.time()
+        latency = finished - changed_at if changed_at else None
+        self.syncs += 1
+        if latency is not None:
+            self.latencies = (self.latencies + [latency])[-100:]
+        self.last_sync = {
+            "finished_at": datetime.fromtimestamp(finished).isoformat(timespec="milliseconds"),
+            "trigger": sorted(changed),
+            "stages": ran,
+            "seconds": round(metrics.total_seconds, 6),
+            "latency_seconds": round(latency, 6) if latency is not None else None,
+            "changed_outputs": report_changes(),
+            "metrics": metrics.to_dict()
+        }
+        metrics.write()
+        self.write_health()
+        if latency is not None:
+            print(f"🔄 Synced {', '.join(sorted(changed))} in {metrics.total_seconds:.3f}s ({latency:.3f}s after the change)")
+
+    def watch(self):
+        """Poll until interrupted, syncing once per settled batch of changes."""
+        snapshot = snapshot_inputs()
+        self.run_sync({"uploads", "discord", "manual"})
+        print(f"👀 Watching {UPLOADS_DIR}/, {DISCORD_FILE} and {MANUAL_MATCHES_FILE} (health: {self.health_file})")
+        pending = set()
+        settled_at = None
+        while True:
+            time.sleep(self.interval)
+            current = snapshot_inputs()
+            changed = changed_inputs(snapshot, current)
+            now = time.monotonic()
+            if changed:
+                pending |= changed
+                snapshot = current
+                settled_at = now + self.debounce
+            elif pending and now >= settled_at:
+                self.run_sync(pending, newest_mtime(snapshot, pending))
+                pending = set()
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the uploads and the Discord export and resync on change.")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE, help="seconds an input must stay unchanged before syncing")
+    parser.add_argument("--workers", type=int, default=1, help="score members in N processes (0 = one per CPU core)")
+    parser.add_argument("--scorer", choices=SCORERS, default="exact", help="fuzzy priority scorer (trigram: batched top-k, approximate)")
+    parser.add_argument("--full", action="store_true", help="ignore the saved match cache on the first sync")
+    parser.add_argument("--compact", action="store_true", help="also write the compact roster and match exports")
+    parser.add_argument("--commit", action="store_true", help="commit the changed outputs after every sync")
+    args = parser.parse_args()
+
+    state = WarmState(
+        scorer=args.scorer, workers=args.workers or os.cpu_count() or 1, full=args.full, compact=args.compact
+    )
+    watcher = Watcher(state, interval=args.interval, debounce=args.debounce, commit=args.commit)
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        print("Stopped.")
+
+if __name__ == "__main__":
+    main()
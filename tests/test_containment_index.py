@@ -0,0 +1,28 @@
+"""ContainmentIndex against the list comprehensions it replaces."""
+import random
+
+from clan_sync.matching import ContainmentIndex
+from clan_sync.roster import normalize
+
+ALPHABET = "abAB1 _-"
+
+def random_rsn(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 8)))
+
+def test_same_candidates_as_full_scan():
+    for seed in range(10):
+        rng = random.Random(seed)
+        rsns = [random_rsn(rng) for _ in range(120)]
+        rsns += rng.sample(rsns, 10)                         # duplicates
+        rsns += ["__", " "]                                  # normalize to ""
+        index = ContainmentIndex(rsns)
+        names = {normalize(random_rsn(rng)) for _ in range(200)} | {normalize(rsn) for rsn in rsns}
+        for name in names:
+            assert index.rsns_containing(name) == [rsn for rsn in rsns if name in normalize(rsn)], (seed, name)
+            assert index.rsns_within(name) == [rsn for rsn in rsns if normalize(rsn) in name], (seed, name)
+
+def test_prebuilt_normalized_rsns():
+    rsns = ["Ab 1", "ab1", "B-b"]
+    index = ContainmentIndex(rsns, [normalize(rsn) for rsn in rsns])
+    assert index.rsns_containing("b1") == ["Ab 1", "ab1"]
+    assert index.rsns_within("xab1bbx") == ["Ab 1", "ab1", "B-b"]
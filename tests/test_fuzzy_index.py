@@ -0,0 +1,38 @@
+"""FuzzyIndex against the full fuzzy_match scan it replaces."""
+import random
+
+from clan_sync.matching import FuzzyIndex, fuzzy_match
+
+# A small alphabet makes near misses, ties and shared bigrams common
+ALPHABET = "abcde01"
+
+def random_name(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 10)))
+
+def mutate(rng, name):
+    chars = list(name)
+    for _ in range(rng.randint(1, 2)):
+        op = rng.randrange(3)
+        pos = rng.randrange(len(chars) + 1)
+        if op == 0:
+            chars.insert(pos, rng.choice(ALPHABET))
+        elif chars and op == 1:
+            del chars[min(pos, len(chars) - 1)]
+        elif chars:
+            chars[min(pos, len(chars) - 1)] = rng.choice(ALPHABET)
+    return "".join(chars)
+
+def test_same_result_as_fuzzy_match():
+    for seed in range(5):
+        rng = random.Random(seed)
+        candidates = [random_name(rng) for _ in range(150)]
+        candidates += rng.sample(candidates, 10)            # duplicates
+        names = [mutate(rng, rng.choice(candidates)) for _ in range(150)]
+        names += [random_name(rng) for _ in range(50)] + [""]
+        for threshold in (0.6, 0.85):
+            index = FuzzyIndex(candidates, threshold)
+            for name in names:
+                assert index.match(name) == fuzzy_match(name, candidates, threshold), (seed, threshold, name)
+
+def test_empty_roster():
+    assert FuzzyIndex([]).match("abc") is None
@@ -0,0 +1,55 @@
+"""The streaming roster writer against the json.load / json.dump path it replaces."""
+import json
+import random
+
+from clan_sync import ingest
+from clan_sync.ranks import roster_hash
+
+ALPHABET = "abAB1 _-é漢\"\\"
+RANKS = ["Recruit", "Corporal", "Sergeant", "Lieutenant", "Captain", "General", "Owner"]
+
+def random_text(rng, alphabet=ALPHABET):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10)))
+
+def random_entries(rng, count):
+    entries = []
+    for _ in range(count):
+        entry = {
+            "rsn": random_text(rng),
+            "rank": rng.choice(RANKS),
+            "joinedDate": f"{rng.randint(1, 28):02d}-Jan-2024",
+            "extra": random_text(rng),
+        }
+        if rng.random() < 0.05:
+            del entry[rng.choice(["rsn", "rank", "joinedDate"])]
+        entries.append(entry)
+    entries += [dict(entry, rank=rng.choice(RANKS)) for entry in rng.sample(entries, count // 10)]  # repeated RSNs
+    return entries
+
+def original_dict(entries):
+    clan = {}
+    for entry in entries:
+        if all(k in entry for k in ("rsn", "rank", "joinedDate")):
+            clan[entry["rsn"]] = {"rank": entry["rank"], "joinedDate": entry["joinedDate"]}
+    return dict(sorted(clan.items()))
+
+def test_same_bytes_and_hash_as_json_dump(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "CHUNK_SIZE", 7)
+    for seed in range(8):
+        rng = random.Random(seed)
+        entries = random_entries(rng, rng.randint(0, 150))
+        upload = tmp_path / f"upload_{seed}.json"
+        upload.write_text(json.dumps({"clanName": "Test", "clanMemberMaps": entries}, ensure_ascii=rng.random() < 0.5), encoding="utf-8")
+
+        streamed = tmp_path / f"streamed_{seed}.json"
+        members = ingest.sorted_members(ingest.iter_clanmates(str(upload)), run_size=rng.randint(1, 20))
+        count, digest = ingest.write_roster_json(members, str(streamed))
+
+        expected = original_dict(entries)
+        reference = tmp_path / f"reference_{seed}.json"
+        with open(reference, "w") as f:
+            json.dump(expected, f, indent=2)
+
+        assert streamed.read_bytes() == reference.read_bytes()
+        assert count == len(expected)
+        assert digest == roster_hash(expected)
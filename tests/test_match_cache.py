@@ -0,0 +1,69 @@
+"""The incremental match cache against a full recompute."""
+import json
+import random
+import string
+
+from clan_sync.matching import match_members
+from clan_sync.roster import Roster
+
+ALPHABET = string.ascii_lowercase + "0123456789_ "
+TABLES = ("matched", "unmatched", "unmatched_rsn", "excluded")
+
+def random_rsn(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 12))).strip() or "a"
+
+def roster_of(rsns):
+    return Roster.from_clanmates({"rsn": rsn, "rank": "Bronze", "joinedDate": "1-Jan-2025"} for rsn in rsns)
+
+def nickname_for(rng, rsns):
+    """A nickname hitting each priority: equal, containing, contained, typo or unrelated."""
+    rsn = rng.choice(rsns)
+    return rng.choice([
+        rsn.upper(),
+        f"[{rng.choice(ALPHABET)}] {rsn}",
+        rsn[1:],
+        rsn[:-1] + rng.choice(ALPHABET),
+        random_rsn(rng)
+    ])
+
+def discord_row(rng, discord_id, rsns):
+    return {
+        "ID": str(discord_id),
+        "User": random_rsn(rng).replace(" ", ""),
+        "Global Display Name": nickname_for(rng, rsns) if rng.random() < 0.3 else "",
+        "Nickname": nickname_for(rng, rsns) if rng.random() < 0.8 else "",
+        "Roles": "EasyPoll" if rng.random() < 0.05 else "Clan Member"
+    }
+
+def assert_same_tables(cached, full):
+    for table in TABLES:
+        assert cached[table] == full[table], table
+
+def test_cached_run_matches_full_recompute():
+    for seed in range(8):
+        rng = random.Random(seed)
+        rsns = sorted({random_rsn(rng) for _ in range(120)})
+        rows = [discord_row(rng, 1000 + i, rsns) for i in range(150)]
+        first = match_members(roster_of(rsns), rows, {})
+        # The cache goes through output/match_cache.json between runs
+        cache = json.loads(json.dumps(first["match_cache"]))
+
+        # Unchanged inputs: everything comes from the cache
+        again = match_members(roster_of(rsns), rows, {}, match_cache=cache)
+        assert_same_tables(again, first)
+        assert again["cache_hits"] == len(rows) - len(first["excluded"])
+
+        # RSNs added and removed, Discord rows edited, added and removed
+        removed = set(rng.sample(rsns, 3))
+        new_rsns = sorted((set(rsns) - removed) | {random_rsn(rng) for _ in range(3)})
+        new_rows = [dict(row) for row in rows if rng.random() > 0.05]
+        for row in rng.sample(new_rows, 15):
+            row["Nickname"] = nickname_for(rng, new_rsns)
+        new_rows += [discord_row(rng, 5000 + i, new_rsns) for i in range(10)]
+        manual = {new_rsns[0]: {"discord_id": new_rows[0]["ID"], "discord_user": new_rows[0]["User"], "nickname": ""}}
+
+        cached = match_members(roster_of(new_rsns), new_rows, manual, match_cache=cache)
+        full = match_members(roster_of(new_rsns), new_rows, manual)
+        assert_same_tables(cached, full)
+        assert cached["match_cache"] == full["match_cache"]
+        assert cached["cache_hits"] > 0